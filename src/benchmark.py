@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Climbing Route Chart Benchmark
+
+This script generates the CSV data of a synthetic gym and measures each stage of the generation of its charts:
+color resolution, CSV parsing, SVG generation with each engine, PDF conversion and merge. For each stage, it reports
+the best duration, the peak memory allocated by Python and the size of the output. The results can be saved as JSON
+and compared with the results of a previous run.
+
+Usage:
+    ./benchmark.py [--relays <count>] [--routes <count>] [--marbled <share>] [--setter-length <length>]
+                   [--repeat <count>] [--json <results.json>] [--compare <baseline.json>]
+
+Arguments:
+    --relays (int): Optional number of relays of the synthetic gym, default is 150.
+    --routes (int): Optional number of routes per relay, default is 8.
+    --marbled (float): Optional share of marbled (multi-color) routes, between 0 and 1, default is 0.2.
+    --setter-length (int): Optional length of the names of the route setters, default is 6.
+    --seed (int): Optional seed of the synthetic gym, default is 0.
+    --repeat (int): Optional number of times each measurement is repeated (the best one is kept), default is 5.
+    --chunks (int): Optional number of documents merged in the merge stage, default is 4.
+    --skip-pdf: Optional flag to skip the PDF conversion and merge stages, e.g. when Cairo is not available.
+    --json (str): Optional filepath where the results are written as JSON.
+    --compare (str): Optional filepath of the JSON results of a previous run to compare with.
+    --threshold (float): Optional relative slowdown above which a stage is reported as a regression, default
+        is 0.1.
+
+Author:
+    Hervé Le Roy
+"""
+
+import argparse
+import csv
+import io
+import json
+import math
+import platform
+import random
+import resource
+import string
+import sys
+import time
+import tracemalloc
+
+from climbing_route_chart import constants
+from climbing_route_chart.csv_processor import read_routes
+from climbing_route_chart.svg_generator import generate_svg_for_relay
+from climbing_route_chart.utils import resolve_color
+
+COLORS = ["BLEUE", "ROUGE", "VERTE", "JAUNE", "NOIRE", "BLANCHE", "ORANGE", "VIOLETTE", "ROSE", "GRISE"]
+GRADES = ["4a", "4b", "4c", "5a", "5b", "5c", "5c+", "6a", "6a+", "6b", "6b+", "6c", "7a", "7b"]
+SETTER_COUNT = 12
+
+
+def parse_arguments():
+    """Parses command line arguments and returns the parsed arguments.
+
+    Returns:
+        argparse.Namespace: An object containing parsed command line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the generation of climbing route charts.")
+    parser.add_argument("--relays", type=int, default=150, help="Number of relays (default: 150).")
+    parser.add_argument("--routes", type=int, default=8, help="Number of routes per relay (default: 8).")
+    parser.add_argument("--marbled", type=float, default=0.2, help="Share of marbled routes (default: 0.2).")
+    parser.add_argument("--setter-length", type=int, default=6, help="Length of setter names (default: 6).")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic gym (default: 0).")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repetitions (default: 5).")
+    parser.add_argument("--chunks", type=int, default=4, help="Number of documents merged (default: 4).")
+    parser.add_argument("--skip-pdf", action="store_true", help="Skip the PDF conversion and merge stages.")
+    parser.add_argument("--json", type=str, help="Filepath where the results are written as JSON.")
+    parser.add_argument("--compare", type=str, help="Filepath of the JSON results of a previous run.")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Relative slowdown reported as a regression (default: 0.1)."
+    )
+    return parser.parse_args()
+
+
+def generate_csv(relays, routes, marbled=0.2, setter_length=6, seed=0):
+    """Generates the CSV data of a synthetic gym.
+
+    Args:
+        relays (int): Number of relays.
+        routes (int): Number of routes per relay.
+        marbled (float, optional): Share of marbled routes, whose color is a combination of 2 or 3 colors.
+            Defaults to 0.2.
+        setter_length (int, optional): Length of the names of the route setters. Defaults to 6.
+        seed (int, optional): Seed of the random generator, so that the same gym can be generated again.
+            Defaults to 0.
+
+    Returns:
+        str: The CSV data, with the 'Relais', 'Couleur', 'Cotation' and 'Ouvreur' columns.
+    """
+    rng = random.Random(seed)
+    setters = ["".join(rng.choices(string.ascii_uppercase, k=setter_length)) for _ in range(SETTER_COUNT)]
+
+    csv_string_io = io.StringIO()
+    writer = csv.writer(csv_string_io, lineterminator="\n")
+    writer.writerow(["Relais", "Couleur", "Cotation", "Ouvreur"])
+    for relay in range(1, relays + 1):
+        for _ in range(routes):
+            if rng.random() < marbled:
+                color = f"MARBREE ({' / '.join(rng.sample(COLORS, rng.choice((2, 3))))})"
+            else:
+                color = rng.choice(COLORS)
+            writer.writerow([relay, color, rng.choice(GRADES), rng.choice(setters)])
+    return csv_string_io.getvalue()
+
+
+def measure(func, repeat):
+    """Calls `func` `repeat` times and returns the best duration in seconds and the result of the last call."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(func):
+    """Calls `func` once and returns the peak memory allocated by Python during the call, in bytes.
+
+    Memory allocated by native libraries, e.g. by Cairo, is not included.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_stage(results, name, func, repeat, size=None):
+    """Measures a stage, prints and records its results, and returns the output of `func`.
+
+    Args:
+        results (dict): Results of the stages, to which the results of this stage are added.
+        name (str): Name of the stage.
+        func (callable): Function running the stage and returning its output.
+        repeat (int): Number of times the duration is measured.
+        size (callable, optional): Function returning the size in bytes of the output of the stage.
+    """
+    duration, output = measure(func, repeat)
+    stage = {"seconds": duration, "peak_memory": peak_memory(func)}
+    if size is not None:
+        stage["output_size"] = size(output)
+    results[name] = stage
+
+    details = f"{duration:.4f}s, peak memory {stage['peak_memory'] / 1024:.0f} KiB"
+    if "output_size" in stage:
+        details += f", output {stage['output_size'] / 1024:.0f} KiB"
+    print(f"{name:>16}: {details}")
+    return output
+
+
+def run_benchmark(args):
+    """Runs every stage on the synthetic gym described by `args` and returns the results.
+
+    Returns:
+        dict: The parameters of the run, the environment and the results of each stage.
+    """
+    csv_data = generate_csv(args.relays, args.routes, args.marbled, args.setter_length, args.seed)
+    color_values = [row["Couleur"] for row in csv.DictReader(io.StringIO(csv_data))]
+    stages = {}
+
+    def resolve_colors():
+        # Measure color resolution without the memoised colors
+        resolve_color.cache_clear()
+        return [resolve_color(value) for value in color_values]
+
+    run_stage(stages, "colors", resolve_colors, args.repeat)
+    grouped_data = run_stage(stages, "parse", lambda: read_routes(io.StringIO(csv_data)), args.repeat)
+
+    outputs = {}
+    for engine in constants.SVG_ENGINES:
+        outputs[engine] = run_stage(
+            stages,
+            f"svg[{engine}]",
+            lambda: [generate_svg_for_relay(relay, group, engine=engine) for relay, group in grouped_data.items()],
+            args.repeat,
+            lambda svg_list: sum(len(svg.encode("utf-8")) for svg in svg_list),
+        )
+
+    reference = outputs[constants.SVG_ENGINES[0]]
+    for engine, svg_list in outputs.items():
+        if svg_list != reference:
+            print(f"Warning: the output of the '{engine}' engine differs from '{constants.SVG_ENGINES[0]}'.")
+
+    if not args.skip_pdf:
+        # Imported here, so that the other stages can be measured without Cairo
+        from climbing_route_chart.pdf_creator import generate_pdf_from_svgs, merge_pdfs
+
+        run_stage(
+            stages, "pdf", lambda: generate_pdf_from_svgs(reference), args.repeat, lambda pdf: len(pdf.getvalue())
+        )
+
+        chunk_size = math.ceil(len(reference) / max(args.chunks, 1))
+        chunks = [
+            generate_pdf_from_svgs(reference[start : start + chunk_size]).getvalue()
+            for start in range(0, len(reference), chunk_size)
+        ]
+        run_stage(stages, "merge", lambda: merge_pdfs(chunks), args.repeat, lambda pdf: len(pdf.getvalue()))
+
+    return {
+        "parameters": {
+            "relays": args.relays,
+            "routes": args.routes,
+            "marbled": args.marbled,
+            "setter_length": args.setter_length,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "chunks": args.chunks,
+        },
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "stages": stages,
+        # Peak resident memory of the whole process, in kilobytes on Linux and bytes on macOS
+        "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def compare_results(results, baseline, threshold):
+    """Prints the change of duration of each stage since a previous run.
+
+    Args:
+        results (dict): The results of this run, as returned by `run_benchmark`.
+        baseline (dict): The results of a previous run.
+        threshold (float): Relative slowdown above which a stage is reported as a regression.
+
+    Returns:
+        list of str: The names of the stages which regressed.
+    """
+    if results["parameters"] != baseline.get("parameters"):
+        print("Warning: the baseline was measured with different parameters.")
+
+    regressions = []
+    for name, stage in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if previous is None:
+            continue
+        change = stage["seconds"] / previous["seconds"] - 1 if previous["seconds"] else 0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = " (regression)"
+        print(f"{name:>16}: {previous['seconds']:.4f}s -> {stage['seconds']:.4f}s ({change:+.1%}){flag}")
+    return regressions
+
+
+def main():
+    """Runs the benchmark, prints the results and compares them with a previous run if requested."""
+    args = parse_arguments()
+
+    print(
+        f"{args.relays} relays of {args.routes} routes, {args.marbled:.0%} marbled, "
+        f"setter names of {args.setter_length} characters, best of {args.repeat}"
+    )
+    results = run_benchmark(args)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(results, json_file, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare_results(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,21 @@
 # __init__.py
 
-from .main import generate_climbing_route_charts  # noqa: F401
+from .cache import RenderCache, batch_cache_key, document_cache_key, key_kind, relay_cache_key  # noqa: F401
+from .csv_processor import CSVValidationError, ingest_csv, process_csv, read_routes  # noqa: F401
+from .instrumentation import StageEvent, StageMetrics, add_stage_hook, remove_stage_hook  # noqa: F401
+from .jobs import JobQueue, QueueFullError, RenderJob  # noqa: F401
+from .main import (  # noqa: F401
+    RenderError,
+    generate_climbing_route_charts,
+    iter_climbing_route_archive,
+    iter_climbing_route_batch,
+    iter_climbing_route_charts,
+    load_routes,
+    render_cached_pages,
+    warm_up,
+)
+from .pdf_creator import merge_pdfs  # noqa: F401
+from .records import Route  # noqa: F401
+from .store import RouteStore  # noqa: F401
+from .svg_generator import generate_svg_for_relay  # noqa: F401
+from .utils import UnknownColor, format_color_warning, resolve_color  # noqa: F401
@@ -0,0 +1,92 @@
+import re
+import zipfile
+
+from .instrumentation import stage
+
+# Characters of a relay identifier which are replaced in the name of its image
+UNSAFE_NAME_PATTERN = re.compile(r"[^\w.-]+")
+
+# Size of the A4 page of a relay in mm, the unitless size of its SVG document
+PAGE_WIDTH_MM = 210
+PAGE_HEIGHT_MM = 297
+MM_PER_INCH = 25.4
+
+
+def svg_to_png(svg, dpi):
+    """Converts an SVG string to a PNG image with CairoSVG.
+
+    The size of the page is unitless, which CairoSVG reads as pixels whatever the resolution, so the size of the
+    image is computed from the resolution and set explicitly, as for the pages of a PDF document.
+
+    Args:
+        svg (str): SVG-formatted string of an A4 page.
+        dpi (int): Resolution of the image.
+
+    Returns:
+        bytes: The PNG image.
+    """
+    # CairoSVG is only imported when an image is rendered
+    from cairosvg import svg2png
+
+    with stage("png") as counts:
+        png = svg2png(
+            bytestring=svg.encode("utf-8"),
+            dpi=dpi,
+            output_width=round(PAGE_WIDTH_MM / MM_PER_INCH * dpi),
+            output_height=round(PAGE_HEIGHT_MM / MM_PER_INCH * dpi),
+        )
+        counts["pages"] = 1
+        counts["bytes"] = len(png)
+    return png
+
+
+def member_name(index, name, extension):
+    """Returns the name of a file in an archive, numbered to keep the order of the files and unique."""
+    return f"{index:03d}_{UNSAFE_NAME_PATTERN.sub('_', str(name))}.{extension}"
+
+
+def image_name(index, relay, extension):
+    """Returns the name of the image of a relay in an archive, numbered to keep the page order and unique."""
+    return member_name(index, f"relais_{relay}", extension)
+
+
+class _ZipStream:
+    """Write-only file object collecting the bytes written by `zipfile.ZipFile`.
+
+    It is not seekable, so `zipfile` writes each member in a single pass, with its sizes after its data.
+    """
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Returns the bytes written since the last call, and forgets them."""
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_zip(members):
+    """Lazily writes a ZIP archive, yielding its bytes as each member is added.
+
+    Args:
+        members (iterable of tuple): (name, data, compress) tuples, where data is bytes or str and compress
+            tells whether the member is deflated (e.g. for SVG images) or stored (e.g. for PNG images, which are
+            already compressed). The iterable is consumed lazily.
+
+    Yields:
+        bytes: The next part of the archive.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, "w") as archive:
+        for name, data, compress in members:
+            archive.writestr(name, data, zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED)
+            yield stream.drain()
+    yield stream.drain()
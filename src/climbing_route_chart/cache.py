@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from . import constants
+from .records import as_routes
+
+
+def relay_cache_key(relay, group, params=None, kind="pdf"):
+    """Computes the content-addressed cache key of a rendered relay.
+
+    The key is a hash of the relay identifier, its normalised rows and the chart parameters, with defaults
+    filled in so that equivalent parameters share the same key. Two relays with the same key render to the
+    same page.
+
+    Args:
+        relay (str): Identifier for the relay group.
+        group (list of Route or dict): Data for the specific relay group.
+        params (dict, optional): Parameters to customize the charts. Defaults to None.
+        kind (str, optional): Kind of rendered output, e.g. 'pdf' or 'svg'. Defaults to 'pdf'.
+
+    Returns:
+        str: A hexadecimal SHA-256 digest.
+    """
+    params = params or {}
+    chart_params = [
+        params.get("radius", constants.RADIUS),
+        params.get("title_fs", constants.TITLE_FS),
+        params.get("grade_fs", constants.GRADE_FS),
+        params.get("setter_fs", constants.SETTER_FS),
+    ]
+    rows = [[route.grade, route.setter, route.color.hex_codes] for route in as_routes(group)]
+    payload = json.dumps([constants.LAYOUT_VERSION, kind, str(relay), rows, chart_params], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def document_cache_key(grouped_data, params=None, kind="pdf"):
+    """Computes the content-addressed key of a whole document, e.g. to be used as an HTTP entity tag.
+
+    The key combines the keys of every relay, in page order, so that documents with the same normalised
+    routes and chart parameters share the same key. It starts with the kind of output, so that the format of a
+    document is known from its key.
+
+    Args:
+        grouped_data (dict): A mapping of relay identifier to the list of its routes.
+        params (dict, optional): Parameters to customize the charts. Defaults to None.
+        kind (str, optional): Kind of rendered output, e.g. 'pdf'. Defaults to 'pdf'.
+
+    Returns:
+        str: The kind and a hexadecimal SHA-256 digest, e.g. 'pdf-3a7bd3e2...'.
+    """
+    digest = hashlib.sha256(kind.encode("utf-8"))
+    for relay, group in grouped_data.items():
+        digest.update(relay_cache_key(relay, group, params, kind).encode("ascii"))
+    return f"{kind}-{digest.hexdigest()}"
+
+
+def batch_cache_key(route_sets, kind="pdf"):
+    """Computes the content-addressed key of a document rendered from several route sets.
+
+    Args:
+        route_sets (list of tuple): (name, grouped_data, params) triples, in document order, where grouped_data
+            is a mapping of relay identifier to the list of its routes.
+        kind (str, optional): Kind of rendered output, e.g. 'pdf' or 'zip'. Defaults to 'pdf'.
+
+    Returns:
+        str: The kind and a hexadecimal SHA-256 digest, see `document_cache_key`.
+    """
+    digest = hashlib.sha256(kind.encode("utf-8"))
+    for name, grouped_data, params in route_sets:
+        digest.update(json.dumps(str(name)).encode("utf-8"))
+        digest.update(document_cache_key(grouped_data, params).encode("ascii"))
+    return f"{kind}-{digest.hexdigest()}"
+
+
+def key_kind(key):
+    """Returns the format of the output identified by a key returned by `document_cache_key` or `batch_cache_key`.
+
+    Args:
+        key (str): The key of a document.
+
+    Returns:
+        str: The format, e.g. 'png' for PNG images at any resolution, or None if the key has no kind.
+    """
+    kind, separator, _ = key.partition("-")
+    return kind.partition("@")[0] if separator else None
+
+
+class RenderCache:
+    """Cache of rendered pages, keyed by `relay_cache_key`.
+
+    Pages are kept in an in-memory LRU tier, bounded by a number of entries and optionally by their total size.
+    When a directory is given, pages are also written to disk, so that they survive restarts and can be shared
+    between processes. The cache is thread-safe.
+
+    Attributes:
+        hits (int): Number of lookups served from the cache.
+        misses (int): Number of lookups not found in the cache.
+    """
+
+    def __init__(self, max_entries=512, directory=None, max_bytes=None):
+        """Initialises an empty cache.
+
+        Args:
+            max_entries (int, optional): Maximum number of pages kept in memory. Defaults to 512.
+            directory (str, optional): Directory of the on-disk tier. If None, pages are only kept in
+                memory. Defaults to None.
+            max_bytes (int, optional): Maximum total size of the pages kept in memory, e.g. when they are whole
+                documents of very different sizes. A page larger than this is not kept in memory. If None, only
+                the number of pages is bounded. Defaults to None.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        """Returns the cached page for `key`, or `None` if it is not cached."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read_from_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, data)
+        return data
+
+    def set(self, key, data):
+        """Stores the page `data` (bytes) under `key`."""
+        with self._lock:
+            self._remember(key, data)
+        self._write_to_disk(key, data)
+
+    def stats(self):
+        """Returns the hit and miss counters, and the number and total size of the pages held in memory."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+    def clear(self):
+        """Empties the in-memory tier and resets the counters. The on-disk tier is kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def _remember(self, key, data):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._entries[key] = data
+        self._bytes += len(data)
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _read_from_disk(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as cache_file:
+                return cache_file.read()
+        except OSError:
+            return None
+
+    def _write_to_disk(self, key, data):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first, so that concurrent readers never see a partial page
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
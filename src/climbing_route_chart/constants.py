@@ -6,6 +6,28 @@ SETTER_FS = 8
 # Disk radius in mm
 RADIUS = 69.5
 
+# Layout of the labels of a slice: the setter is drawn SETTER_OFFSET mm below the grade (less when they are shrunk),
+# and a label wider than LABEL_WIDTH_RATIO of the chord of its slice is shrunk, down to LABEL_MIN_SCALE of its font
+# size, then wrapped on lines spaced by LINE_SPACING times the font size
+SETTER_OFFSET = 12
+LABEL_WIDTH_RATIO = 0.9
+LABEL_MIN_SCALE = 0.75
+LINE_SPACING = 1.2
+
+# Version of the layout of the charts, part of the cache keys so that pages rendered with a previous layout are not
+# served from a cache
+LAYOUT_VERSION = 3
+
+# Engines available to generate the SVG of a relay, and the default one
+SVG_ENGINES = ("drawsvg", "template")
+SVG_ENGINE = "drawsvg"
+
+# Output formats: a PDF document, or a ZIP archive of one SVG or PNG image per relay
+OUTPUT_FORMATS = ("pdf", "svg", "png")
+
+# Default resolution of PNG images
+PNG_DPI = 150
+
 # Hex code to color mapping
 HEX_TO_COLOR_MAPPING = {
     "#ff0000": ["ROUGE", "RED"],
@@ -1,9 +1,45 @@
 import csv
+import io
 
-from .utils import process_color
+from .instrumentation import stage
+from .records import Route
+from .utils import UnknownColor, process_color, resolve_color
 
+REQUIRED_COLUMNS = {"Relais", "Couleur", "Cotation", "Ouvreur"}
+REQUIRED_HEADERS = ["Relais", "Couleur", "Cotation", "Ouvreur"]
 
-def process_csv(csv_string_io):
+# Maximum number of errors listed in a CSVValidationError message
+MAX_REPORTED_ERRORS = 50
+
+
+class CSVValidationError(ValueError):
+    """Raised when CSV data is invalid.
+
+    Attributes:
+        errors (list of str): Every error found in the data, each mentioning its line number.
+    """
+
+    def __init__(self, errors):
+        self.errors = errors
+        message = "\n".join(errors[:MAX_REPORTED_ERRORS])
+        if len(errors) > MAX_REPORTED_ERRORS:
+            message += f"\n... and {len(errors) - MAX_REPORTED_ERRORS} more errors"
+        super().__init__(message)
+
+
+def _create_reader(csv_string_io):
+    """Returns a DictReader over the CSV data, after checking that it has the required columns."""
+    reader = csv.DictReader(csv_string_io)
+
+    # Validate required columns
+    if reader.fieldnames is None or not REQUIRED_COLUMNS.issubset(reader.fieldnames):
+        missing_columns = REQUIRED_COLUMNS - set(reader.fieldnames or [])
+        raise ValueError(f"CSV data is missing the following required columns: {missing_columns}")
+
+    return reader
+
+
+def process_csv(csv_string_io, warnings=None):
     """Reads and processes CSV data from a StringIO object for chart generation.
 
     This function reads climbing route data from a CSV-formatted string and processes it. It checks for
@@ -13,6 +49,8 @@ def process_csv(csv_string_io):
 
     Args:
         csv_string_io (io.StringIO): A StringIO object containing CSV-formatted data of climbing routes.
+        warnings (list, optional): List to which an `UnknownColor` diagnostic is appended for each color
+            name which was not found. Defaults to None.
 
     Raises:
         ValueError: If the CSV data is missing one or more required columns or if the CSV is malformed.
@@ -21,21 +59,117 @@ def process_csv(csv_string_io):
         List of Dicts: Each dict contains processed data for a row, specifically the columns 'Relais', 'Cotation',
         'Ouvreur', and 'Couleur'.
     """
-    reader = csv.DictReader(csv_string_io)
-
-    # Validate required columns
-    required_columns = {"Relais", "Couleur", "Cotation", "Ouvreur"}
-    if not required_columns.issubset(reader.fieldnames):
-        missing_columns = required_columns - set(reader.fieldnames)
-        raise ValueError(f"CSV data is missing the following required columns: {missing_columns}")
+    reader = _create_reader(csv_string_io)
 
     # Process data
     processed_data = []
     for row in reader:
         # Convert color names to hex codes
-        row["Couleur"] = process_color(row["Couleur"])
+        row["Couleur"] = process_color(row["Couleur"], warnings, reader.line_num)
 
         # Extract relevant columns and add to processed data
-        processed_data.append({col: row[col] for col in required_columns})
+        processed_data.append({col: row[col] for col in REQUIRED_COLUMNS})
 
     return processed_data
+
+
+def read_routes(csv_string_io, warnings=None):
+    """Reads CSV data into compact `Route` records, grouped by relay as the rows are read.
+
+    This is the counterpart of `process_csv` followed by grouping, without creating a dict per row. Rows are
+    read lazily, so the CSV data can be streamed from a file. Colors are resolved with `resolve_color`, so each
+    distinct color value is only parsed once.
+
+    Args:
+        csv_string_io (io.StringIO, file object or iterable of str): CSV-formatted data of climbing routes.
+        warnings (list, optional): List to which an `UnknownColor` diagnostic is appended for each color
+            name which was not found. Defaults to None.
+
+    Raises:
+        ValueError: If the CSV data is missing one or more required columns or if the CSV is malformed.
+
+    Returns:
+        dict: A mapping of relay identifier to the list of its routes, in the order in which relays first
+        appear.
+    """
+    with stage("parse") as counts:
+        reader = _create_reader(csv_string_io)
+
+        grouped_data = {}
+        for row in reader:
+            color = resolve_color(row["Couleur"])
+            if color.unknown and warnings is not None:
+                warnings.extend(UnknownColor(name, row["Couleur"], reader.line_num) for name in color.unknown)
+
+            route = Route(row["Relais"], row["Cotation"], row["Ouvreur"], color)
+            group = grouped_data.get(route.relay)
+            if group is None:
+                group = grouped_data[route.relay] = []
+            group.append(route)
+
+        counts["rows"] = sum(len(group) for group in grouped_data.values())
+        counts["relays"] = len(grouped_data)
+    return grouped_data
+
+
+def ingest_csv(text, warnings=None):
+    """Parses, validates and reads CSV text pasted by a user, in a single pass.
+
+    The delimiter (tab, as when copying from a spreadsheet, or comma) is detected from the header line. The
+    header must contain exactly the 'Relais', 'Couleur', 'Cotation' and 'Ouvreur' columns, in this order.
+    Every row is checked and read into `Route` records grouped by relay; all the invalid rows are reported
+    at once. Blank lines are ignored.
+
+    Args:
+        text (str): The CSV text to parse and validate.
+        warnings (list, optional): List to which an `UnknownColor` diagnostic is appended for each color
+            name which was not found. Defaults to None.
+
+    Raises:
+        CSVValidationError: If the header is missing or incorrect, or if any row does not contain the correct
+            number of values.
+
+    Returns:
+        dict: A mapping of relay identifier to the list of its routes, in the order in which relays first
+        appear.
+    """
+    with stage("parse") as counts:
+        # Determine delimiter (tab or comma)
+        header_line = text.split("\n", 1)[0]
+        delimiter = "\t" if "\t" in header_line else ","
+
+        reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+
+        # Check for required headers
+        if next(reader, None) != REQUIRED_HEADERS:
+            raise CSVValidationError(["CSV header missing or incorrect on line 1"])
+
+        errors = []
+        grouped_data = {}
+        for row in reader:
+            if not row:
+                continue
+            if len(row) != len(REQUIRED_HEADERS):
+                errors.append(f"CSV row on line {reader.line_num} does not contain the correct number of values")
+                continue
+            if errors:
+                # The data will be rejected anyway, only look for other errors
+                continue
+
+            relay, color_value, grade, setter = row
+            color = resolve_color(color_value)
+            if color.unknown and warnings is not None:
+                warnings.extend(UnknownColor(name, color_value, reader.line_num) for name in color.unknown)
+
+            route = Route(relay, grade, setter, color)
+            group = grouped_data.get(route.relay)
+            if group is None:
+                group = grouped_data[route.relay] = []
+            group.append(route)
+
+        if errors:
+            raise CSVValidationError(errors)
+
+        counts["rows"] = sum(len(group) for group in grouped_data.values())
+        counts["relays"] = len(grouped_data)
+    return grouped_data
@@ -0,0 +1,84 @@
+import functools
+import math
+import re
+
+# The labels are drawn with DejaVu Sans, which they name as their font family, so that the table below matches the
+# font used whatever fontconfig's default sans-serif font is (the font must be installed, see the Dockerfile).
+# CairoSVG draws a label character by character, each one placed at the advance of the previous one, without
+# kerning: the width of a label is the sum of the advances of its characters, which are read from this table rather
+# than measured by Cairo.
+FONT_FAMILY = "DejaVu Sans"
+UNITS_PER_EM = 2048
+
+# Characters of the table: printable ASCII, Latin-1 and the French ligatures, dashes and quotes
+_CHARACTERS = (
+    [chr(code) for code in range(0x20, 0x7F)]
+    + [chr(code) for code in range(0xA0, 0x100)]
+    + ["\u0152", "\u0153", "\u2013", "\u2014", "\u2018", "\u2019", "\u201c", "\u201d", "\u2026"]
+)
+# Advance widths of the characters above, in font units, read from DejaVuSans.ttf 2.37
+_ADVANCES = (
+    "651 821 942 1716 1303 1946 1597 563 799 799 1024 1716 651 739 651 690 1303 1303 1303 1303 1303 1303 "
+    "1303 1303 1303 1303 690 690 1716 1716 1716 1087 2048 1401 1405 1430 1577 1294 1178 1587 1540 604 604 "
+    "1343 1141 1767 1532 1612 1235 1612 1423 1300 1251 1499 1401 2025 1403 1251 1403 799 690 799 1716 1024 "
+    "1024 1255 1300 1126 1300 1260 721 1300 1298 569 569 1186 569 1995 1298 1253 1300 1300 842 1067 803 1298 "
+    "1212 1675 1212 1212 1075 1303 690 1303 1716 651 821 1303 1303 1303 1303 690 1024 1024 2048 965 1253 "
+    "1716 739 2048 1024 1024 1716 821 821 1024 1303 1303 651 1024 821 965 1253 1985 1985 1985 1087 1401 1401 "
+    "1401 1401 1401 1401 1995 1430 1294 1294 1294 1294 604 604 604 604 1587 1532 1612 1612 1612 1612 1612 "
+    "1716 1612 1499 1499 1499 1499 1251 1239 1290 1255 1255 1255 1255 1255 1255 2011 1126 1260 1260 1260 "
+    "1260 569 569 569 569 1253 1298 1253 1253 1253 1253 1253 1716 1253 1298 1298 1298 1298 1212 1300 1212 "
+    "2191 2095 1024 2048 651 651 1061 1061 2048"
+)
+GLYPH_ADVANCES = dict(zip(_CHARACTERS, map(int, _ADVANCES.split())))
+
+# Advance assumed for the characters missing from the table: one em, which is wider than most characters
+DEFAULT_ADVANCE = UNITS_PER_EM
+
+
+@functools.lru_cache(maxsize=4096)
+def text_width(text, font_size):
+    """Returns the width of a line of text drawn by CairoSVG, in the units of the font size.
+
+    Args:
+        text (str): The line of text.
+        font_size (float): The font size.
+
+    Returns:
+        float: The width of the line.
+    """
+    return sum(GLYPH_ADVANCES.get(character, DEFAULT_ADVANCE) for character in text) * font_size / UNITS_PER_EM
+
+
+@functools.lru_cache(maxsize=4096)
+def fit_label(text, font_size, max_width, min_font_size):
+    """Fits a label into a width, shrinking it and, if needed, wrapping it on several lines.
+
+    A label which fits keeps its font size. Otherwise, it is shrunk to fit, down to `min_font_size`. A label which
+    is still too wide is wrapped at its spaces, filling each line at `min_font_size`, then shrunk so that its
+    longest line fits, which may take it below `min_font_size` (e.g. for a single long word). Shrunk font sizes
+    are rounded down to a tenth. Labels with explicit line breaks are kept as they are.
+
+    Args:
+        text (str): The label.
+        font_size (float): The font size of the label.
+        max_width (float): The width available to the label.
+        min_font_size (float): The font size below which the label is wrapped rather than shrunk.
+
+    Returns:
+        tuple: The lines of the label (tuple of str) and their font size.
+    """
+    if "\n" in text or text_width(text, font_size) <= max_width:
+        return (text,), font_size
+
+    lines = [text]
+    if text_width(text, min_font_size) > max_width:
+        lines = []
+        for word in re.split(r"\s+", text.strip()):
+            if lines and text_width(f"{lines[-1]} {word}", min_font_size) <= max_width:
+                lines[-1] = f"{lines[-1]} {word}"
+            else:
+                lines.append(word)
+
+    longest = max(text_width(line, font_size) for line in lines)
+    size = font_size if longest <= max_width else math.floor(font_size * max_width / longest * 10) / 10
+    return tuple(lines), size
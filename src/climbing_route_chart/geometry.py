@@ -0,0 +1,141 @@
+import functools
+import math
+from collections import namedtuple
+
+# Position of the center of the pie chart on the page, in mm
+CENTER_X = 105
+CENTER_Y = 150
+
+# Distance of the labels from the center, relative to the radius
+TEXT_RADIUS_MULTIPLIER = 0.6
+
+# Geometry of one slice of a pie chart: the start and end points of its arc and the anchor of its labels
+SliceGeometry = namedtuple("SliceGeometry", ["x1", "y1", "x2", "y2", "text_x", "text_y"])
+
+# Frame in which a slice filled with a gradient is drawn, so that every slice with the same colors can share a single
+# gradient running from (0, 0) to (1, 0): `transform` maps these points onto the start and end points of the slice's
+# arc, by a rotation and a uniform scaling. The center and radius of the pie chart and the stroke width are
+# expressed in the units of the frame.
+SliceFrame = namedtuple("SliceFrame", ["transform", "center_x", "center_y", "radius", "stroke_width"])
+
+
+# The geometry is memoised by number of routes and radius, which can come from a request, so the number of memoised
+# results is bounded
+GEOMETRY_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def pie_geometry(num_routes, radius, center_x=CENTER_X, center_y=CENTER_Y):
+    """Computes the geometry of every slice of a pie chart with `num_routes` slices.
+
+    The result only depends on the number of routes and the radius, so it is computed once and shared by all
+    the relays with the same number of routes.
+
+    A single route is drawn as a full disk: its gradient spans the horizontal diameter and its labels are
+    placed above the center.
+
+    Args:
+        num_routes (int): Number of slices of the pie chart.
+        radius (float): The radius of the pie chart.
+        center_x (float, optional): The x-coordinate of the center of the pie chart.
+        center_y (float, optional): The y-coordinate of the center of the pie chart.
+
+    Returns:
+        tuple of SliceGeometry: The geometry of each slice, clockwise from the 3 o'clock position.
+    """
+    if num_routes == 1:
+        return (
+            SliceGeometry(center_x - radius, center_y, center_x + radius, center_y, center_x, center_y - radius / 2),
+        )
+
+    slices = []
+    start_angle = 0
+    for _ in range(num_routes):
+        sweep_angle = 360 / num_routes
+        end_angle = start_angle + sweep_angle
+        mid_angle = (start_angle + end_angle) / 2
+        slices.append(
+            SliceGeometry(
+                center_x + radius * math.cos(math.radians(start_angle)),
+                center_y + radius * math.sin(math.radians(start_angle)),
+                center_x + radius * math.cos(math.radians(end_angle)),
+                center_y + radius * math.sin(math.radians(end_angle)),
+                center_x + radius * TEXT_RADIUS_MULTIPLIER * math.cos(math.radians(mid_angle)),
+                center_y + radius * TEXT_RADIUS_MULTIPLIER * math.sin(math.radians(mid_angle)),
+            )
+        )
+        start_angle = end_angle
+    return tuple(slices)
+
+
+@functools.lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def slice_frames(num_routes, radius, center_x=CENTER_X, center_y=CENTER_Y):
+    """Computes the frame of every slice of a pie chart with `num_routes` slices, see `SliceFrame`.
+
+    As the frame only rotates and scales uniformly, a gradient drawn in it looks exactly like a gradient running
+    from the start to the end point of the arc in page units, and the stroke keeps its width.
+
+    Args:
+        num_routes (int): Number of slices of the pie chart.
+        radius (float): The radius of the pie chart.
+        center_x (float, optional): The x-coordinate of the center of the pie chart.
+        center_y (float, optional): The y-coordinate of the center of the pie chart.
+
+    Returns:
+        tuple of SliceFrame: The frame of each slice, in the order of `pie_geometry`.
+    """
+    frames = []
+    for x1, y1, x2, y2, _, _ in pie_geometry(num_routes, radius, center_x, center_y):
+        dx, dy = x2 - x1, y2 - y1
+        length = math.hypot(dx, dy)
+        rel_x, rel_y = center_x - x1, center_y - y1
+        # The values are rounded to keep the SVG short: to a millionth of a mm for the transform, and to the same
+        # order of magnitude once scaled for the other ones, which is far below what Cairo can render
+        matrix = ",".join(str(round(value, 6) + 0.0) for value in (dx, dy, -dy, dx, x1, y1))  # + 0.0 drops -0.0
+        frames.append(
+            SliceFrame(
+                f"matrix({matrix})",
+                round((rel_x * dx + rel_y * dy) / length**2, 9),
+                round((rel_y * dx - rel_x * dy) / length**2, 9),
+                round(radius / length, 9),
+                round(1 / length, 9),
+            )
+        )
+    return tuple(frames)
+
+
+@functools.lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def label_width(num_routes, radius):
+    """Computes the width available to the labels of each slice of a pie chart with `num_routes` slices.
+
+    It is the chord of a slice at the distance of its labels from the center, or, for a single route drawn as a
+    full disk, the chord of the disk at the height of its labels.
+
+    Args:
+        num_routes (int): Number of slices of the pie chart.
+        radius (float): The radius of the pie chart.
+
+    Returns:
+        float: The width of the chord.
+    """
+    if num_routes == 1:
+        return 2 * math.sqrt(radius**2 - (radius / 2) ** 2)
+    return 2 * radius * TEXT_RADIUS_MULTIPLIER * math.sin(math.pi / max(num_routes, 2))
+
+
+def compute_batch_geometry(grouped_data, radius):
+    """Computes the geometry of the pie charts of every relay at once.
+
+    Relays are deduplicated by number of routes, so the trigonometry runs once per distinct route count
+    rather than once per route. The results are memoised by `pie_geometry`, which the SVG generation then
+    only has to look up.
+
+    Args:
+        grouped_data (dict): A mapping of relay identifier to the list of its routes.
+        radius (float): The radius of the pie charts.
+
+    Returns:
+        dict: A mapping of number of routes to the geometry of its slices, see `pie_geometry`.
+    """
+    route_counts = {len(group) for group in grouped_data.values()}
+    return {num_routes: pie_geometry(num_routes, radius) for num_routes in sorted(route_counts) if num_routes > 0}
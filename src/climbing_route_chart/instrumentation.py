@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Default upper bounds of the duration histograms, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Measurement of one run of a pipeline stage: its name, its duration in seconds, what it processed or produced
+# (e.g. {"rows": 120, "relays": 15} or {"pages": 1, "bytes": 5120}) and the error it raised (None if it succeeded)
+StageEvent = namedtuple("StageEvent", ["stage", "seconds", "counts", "error"])
+
+_hooks = []
+
+
+def add_stage_hook(hook):
+    """Registers a function called with a `StageEvent` each time a pipeline stage completes.
+
+    The stages are 'parse' (CSV data read into routes), 'group' (rows already parsed converted to routes), 'svg'
+    (one relay drawn), 'pdf' (one page converted by cairo, or the final part of a document), 'merge' (PDF
+    documents concatenated) and 'document' (a whole call to `generate_climbing_route_charts`).
+
+    Hooks are called in the thread running the stage. Stages run by worker processes are not reported.
+
+    Args:
+        hook (callable): Function taking a `StageEvent`.
+    """
+    _hooks.append(hook)
+
+
+def remove_stage_hook(hook):
+    """Unregisters a hook registered with `add_stage_hook`."""
+    _hooks.remove(hook)
+
+
+@contextmanager
+def stage(name):
+    """Context manager measuring a pipeline stage and reporting it to the registered hooks.
+
+    It yields a dict to which the stage adds its counts. An exception raised by the stage is reported, then
+    propagated.
+
+    Args:
+        name (str): Name of the stage.
+    """
+    counts = {}
+    if not _hooks:
+        yield counts
+        return
+
+    start = time.perf_counter()
+    try:
+        yield counts
+    except Exception as e:
+        _report(StageEvent(name, time.perf_counter() - start, counts, e))
+        raise
+    _report(StageEvent(name, time.perf_counter() - start, counts, None))
+
+
+def _report(event):
+    for hook in list(_hooks):
+        hook(event)
+
+
+class StageMetrics:
+    """Stage hook aggregating the measurements into Prometheus metrics.
+
+    For each stage, it keeps a histogram of the durations, a counter of the errors and a counter of each
+    reported count (e.g. rows, relays, pages or bytes). It is thread-safe.
+    """
+
+    def __init__(self, prefix="climbing_route_chart", buckets=DEFAULT_BUCKETS):
+        """Initialises empty metrics.
+
+        Args:
+            prefix (str, optional): Prefix of the metric names. Defaults to 'climbing_route_chart'.
+            buckets (tuple of float, optional): Upper bounds of the duration histograms, in seconds, in
+                increasing order. Defaults to `DEFAULT_BUCKETS`.
+        """
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self._durations = {}
+        self._errors = {}
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            histogram = self._durations.get(event.stage)
+            if histogram is None:
+                histogram = self._durations[event.stage] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if event.seconds <= bound:
+                    histogram[0][i] += 1
+                    break
+            histogram[1] += event.seconds
+            histogram[2] += 1
+
+            if event.error is not None:
+                self._errors[event.stage] = self._errors.get(event.stage, 0) + 1
+            for name, value in event.counts.items():
+                self._counts[name, event.stage] = self._counts.get((name, event.stage), 0) + value
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Duration of the pipeline stages.", f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage_name, (bucket_counts, total, count) in sorted(self._durations.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{stage="{stage_name}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage_name}",le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{stage="{stage_name}"}} {total}')
+                lines.append(f'{name}_count{{stage="{stage_name}"}} {count}')
+
+            name = f"{self.prefix}_stage_errors_total"
+            lines += [f"# HELP {name} Number of failed runs of the pipeline stages.", f"# TYPE {name} counter"]
+            for stage_name in sorted(self._durations):
+                lines.append(f'{name}{{stage="{stage_name}"}} {self._errors.get(stage_name, 0)}')
+
+            for count_name in sorted({count_name for count_name, _ in self._counts}):
+                name = f"{self.prefix}_stage_{count_name}_total"
+                lines += [
+                    f"# HELP {name} Number of {count_name} processed by the pipeline stages.",
+                    f"# TYPE {name} counter",
+                ]
+                for (other_name, stage_name), value in sorted(self._counts.items()):
+                    if other_name == count_name:
+                        lines.append(f'{name}{{stage="{stage_name}"}} {value}')
+        return "\n".join(lines) + "\n"
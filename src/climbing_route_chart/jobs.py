@@ -0,0 +1,175 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .main import generate_climbing_route_charts
+
+# Statuses of a render job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted to a `JobQueue` which already holds its maximum number of pending jobs."""
+
+
+class RenderJob:
+    """A document rendered in the background by a `JobQueue`.
+
+    Attributes:
+        id (str): Unique identifier of the job.
+        status (str): One of 'queued', 'running', 'done' or 'failed'.
+        done (int): Number of relays rendered so far.
+        total (int): Number of relays to render.
+        key (str): Key of the document in the document cache of the queue, e.g. its entity tag, or None.
+        result (bytes): The PDF document, once the job is done.
+        error (str): The reason of the failure, if the job failed.
+        created (float): Time at which the job was submitted, as returned by `time.monotonic`.
+        finished (float): Time at which the job finished, or None while it is pending.
+    """
+
+    def __init__(self, total, key=None):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.done = 0
+        self.total = total
+        self.key = key
+        self.result = None
+        self.error = None
+        self.created = time.monotonic()
+        self.finished = None
+
+    @property
+    def pending(self):
+        """True while the job is queued or running."""
+        return self.status in (QUEUED, RUNNING)
+
+    def to_dict(self):
+        """Returns the status and progress of the job, e.g. to be serialised to JSON."""
+        return {"id": self.id, "status": self.status, "done": self.done, "total": self.total, "error": self.error}
+
+
+class JobQueue:
+    """Renders documents on a bounded pool of background threads.
+
+    Submitting a job returns immediately; its status and progress can then be polled with `get`. Finished
+    jobs are kept for `ttl` seconds, after which they are expired and their document is released, and at most
+    `max_finished` of them are kept, the oldest ones being expired first.
+
+    Documents are also stored in the `documents` cache under the key of their job, unless a relay could not be
+    rendered, so that a document which was already rendered, by a job or otherwise, is not rendered again. When
+    `slots` is given, a job only starts rendering once it acquired one of them, so that jobs and other renders share
+    the same limit.
+    """
+
+    def __init__(self, workers=2, max_pending=16, ttl=600, cache=None, max_finished=32, documents=None, slots=None):
+        """Initialises an empty queue.
+
+        Args:
+            workers (int, optional): Number of jobs rendered concurrently. Defaults to 2.
+            max_pending (int, optional): Maximum number of queued or running jobs. Defaults to 16.
+            ttl (float, optional): Number of seconds finished jobs are kept. Defaults to 600.
+            cache (RenderCache, optional): Cache of rendered pages shared by the jobs. The documents are then merged
+                from one-page documents which each embed their own fonts, so it only pays off when the same relays
+                are rendered again and again. If None, each document is drawn on a single PDF surface. Defaults to
+                None.
+            max_finished (int, optional): Maximum number of finished jobs kept. Defaults to 32.
+            documents (RenderCache, optional): Cache of the rendered documents, keyed by the key of their job.
+                Defaults to None.
+            slots (threading.Semaphore, optional): Semaphore held by a job while it renders. Defaults to None.
+        """
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.cache = cache
+        self.max_finished = max_finished
+        self.documents = documents
+        self.slots = slots
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render-job")
+
+    def submit(self, grouped_data, params=None, key=None):
+        """Queues the rendering of routes grouped by relay.
+
+        Args:
+            grouped_data (dict): A mapping of relay identifier to the list of its routes, e.g. as returned by
+                `ingest_csv`.
+            params (dict, optional): Parameters to customize the charts, see `generate_climbing_route_charts`.
+            key (str, optional): Key of the document in the `documents` cache, e.g. as returned by
+                `document_cache_key`. Defaults to None.
+
+        Raises:
+            QueueFullError: If the queue already holds `max_pending` pending jobs.
+
+        Returns:
+            RenderJob: The queued job, or a job which is already done if the document is cached.
+        """
+        self.expire()
+        job = RenderJob(len(grouped_data), key)
+        document = self.documents.get(key) if self.documents is not None and key is not None else None
+        if document is not None:
+            job.done, job.result, job.status = job.total, document, DONE
+            job.finished = time.monotonic()
+            with self._lock:
+                self._jobs[job.id] = job
+            self.expire()
+            return job
+
+        with self._lock:
+            if sum(1 for queued_job in self._jobs.values() if queued_job.pending) >= self.max_pending:
+                raise QueueFullError("Too many documents are being rendered, please retry later.")
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, grouped_data, params)
+        return job
+
+    def get(self, job_id):
+        """Returns the job with identifier `job_id`, or `None` if it is unknown or expired."""
+        self.expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def expire(self):
+        """Forgets the jobs which finished more than `ttl` seconds ago, and the oldest ones over `max_finished`."""
+        deadline = time.monotonic() - self.ttl
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished is not None), key=lambda job: job.finished
+            )
+            excess = max(len(finished) - self.max_finished, 0)
+            for index, job in enumerate(finished):
+                if index < excess or job.finished < deadline:
+                    del self._jobs[job.id]
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads, after the pending jobs if `wait` is True."""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job, grouped_data, params):
+        if self.slots is not None:
+            self.slots.acquire()
+        job.status = RUNNING
+
+        def progress(done, total):
+            job.done, job.total = done, total
+
+        try:
+            relay_errors = []
+            pdf_stream = generate_climbing_route_charts(
+                grouped_data, params, cache=self.cache, progress=progress, raise_errors=True, relay_errors=relay_errors
+            )
+            job.result = pdf_stream.getvalue()
+            # A document with missing pages is not cached, so that it is rendered again when it is submitted again
+            if self.documents is not None and job.key is not None and not relay_errors:
+                self.documents.set(job.key, job.result)
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+            job.finished = time.monotonic()
+        self.expire()
@@ -1,55 +1,583 @@
 import io
+import itertools
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-from .csv_processor import process_csv
-from .pdf_creator import generate_pdf_from_svgs
+from . import constants
+from .archive import image_name, iter_zip, member_name, svg_to_png
+from .cache import document_cache_key, relay_cache_key
+from .csv_processor import read_routes
+from .geometry import compute_batch_geometry
+from .instrumentation import stage
+from .pdf_creator import generate_pdf_from_svgs, iter_pdf_from_svgs, merge_pdfs
+from .records import as_routes
 from .svg_generator import generate_svg_for_relay
 
+logger = logging.getLogger(__name__)
 
-def generate_climbing_route_charts(csv_string, params=None):
+
+class RenderError(ValueError):
+    """Raised when none of the relays of a document could be rendered, so that the document would have no page."""
+
+    def __init__(self):
+        super().__init__("No relay could be rendered.")
+
+
+def load_routes(source, warnings=None):
+    """Returns the routes grouped by relay, reading them from CSV data if needed.
+
+    CSV data is parsed lazily, row by row, and grouped by relay as it is read, so that a file never has to be
+    loaded in memory as a whole.
+
+    Args:
+        source (str, os.PathLike, file object, iterable of str or dict): A string containing CSV formatted data,
+            the path of a CSV file (e.g. a `pathlib.Path`), a file object or any iterable of CSV lines, or
+            routes already grouped by relay (e.g. as returned by `read_routes` or `ingest_csv`).
+        warnings (list, optional): List to which an `UnknownColor` diagnostic is appended for each color
+            name which was not found. Defaults to None.
+
+    Returns:
+        dict: A mapping of relay identifier to the list of its routes.
+    """
+    if isinstance(source, dict):
+        with stage("group") as counts:
+            grouped_data = {relay: as_routes(group) for relay, group in source.items()}
+            counts["rows"] = sum(len(group) for group in grouped_data.values())
+            counts["relays"] = len(grouped_data)
+        return grouped_data
+    if isinstance(source, str):
+        return read_routes(io.StringIO(source), warnings)
+    if isinstance(source, os.PathLike):
+        with open(source, "r", encoding="utf-8", newline="") as csv_file:
+            return read_routes(csv_file, warnings)
+    return read_routes(source, warnings)
+
+
+def render_relays(relays, params, progress=None):
+    """Renders a sequence of relays to a multi-page PDF document.
+
+    Each relay is converted to SVG and drawn as one page. A relay that fails to render is skipped and
+    reported in the returned errors, so that the remaining relays still produce their pages. This function
+    is used both in-process and as the task run by worker processes.
+
+    Args:
+        relays (list of tuple): (relay, group) pairs, in page order.
+        params (dict): Parameters to customize the charts, passed to `generate_svg_for_relay`.
+        progress (callable, optional): Called with the number of relays processed so far and the total number
+            of relays, each time a page is drawn. Defaults to None.
+
+    Returns:
+        tuple: The PDF document as bytes (or `None` if no relay could be rendered) and a list of
+        (relay, error message) tuples for the relays that failed.
+    """
+    svg_list = []
+    errors = []
+    for relay, group in relays:
+        try:
+            svg_list.append((relay, generate_svg_for_relay(relay, group, **params)))
+        except Exception as e:
+            errors.append((relay, str(e)))
+
+    if not svg_list:
+        return None, errors
+
+    def on_error(index, error):
+        errors.append((svg_list[index][0], str(error)))
+
+    pdf_stream = io.BytesIO()
+    parts = iter_pdf_from_svgs((svg for _, svg in svg_list), on_error)
+    for page, part in enumerate(parts, start=1):
+        pdf_stream.write(part)
+        # The last part, written once the document is finished, is not a page
+        done = page + len(errors)
+        if progress is not None and done <= len(relays):
+            progress(done, len(relays))
+    if len(errors) == len(relays):
+        return None, errors
+    return pdf_stream.getvalue(), errors
+
+
+def render_relay_page(relay, group, params):
+    """Renders a single relay to a one-page PDF document.
+
+    Args:
+        relay (str): Identifier for the relay group.
+        group (list of dict): Data for the specific relay group.
+        params (dict): Parameters to customize the charts, passed to `generate_svg_for_relay`.
+
+    Returns:
+        bytes: The one-page PDF document.
+    """
+    svg = generate_svg_for_relay(relay, group, **params)
+    return generate_pdf_from_svgs([svg]).getvalue()
+
+
+def _render_relay_page_or_error(relay, group, params):
+    """Calls `render_relay_page`, returning a (page, error message) tuple instead of raising."""
+    try:
+        return render_relay_page(relay, group, params), None
+    except Exception as e:
+        return None, str(e)
+
+
+def render_cached_pages(relays, params, cache, workers=None, progress=None):
+    """Returns the one-page PDF document of each relay, rendering only the relays missing from the cache.
+
+    Args:
+        relays (list of tuple): (relay, group) pairs, in page order.
+        params (dict): Parameters to customize the charts, passed to `generate_svg_for_relay`.
+        cache (RenderCache): Cache of rendered pages. Newly rendered pages are added to it.
+        workers (int, optional): Number of worker processes used to render the missing relays. If None or
+            1, they are rendered in the current process. Defaults to None.
+        progress (callable, optional): Called with the number of relays processed so far and the total number
+            of relays, once the cached pages are found and then after each rendered page. Defaults to None.
+
+    Returns:
+        tuple: The list of pages as bytes, in the order of `relays` (`None` for relays which failed), and a
+        list of (relay, error message) tuples for the relays that failed.
+    """
+    keys = [relay_cache_key(relay, group, params) for relay, group in relays]
+    pages = [cache.get(key) for key in keys]
+    missing = [i for i, page in enumerate(pages) if page is None]
+
+    done = len(relays) - len(missing)
+    if progress is not None:
+        progress(done, len(relays))
+
+    args = ([relays[i][0] for i in missing], [relays[i][1] for i in missing], [params] * len(missing))
+    executor = None
+    if workers is not None and workers > 1 and len(missing) > 1:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(missing)))
+        results = executor.map(_render_relay_page_or_error, *args)
+    else:
+        results = map(_render_relay_page_or_error, *args)
+
+    errors = []
+    try:
+        for i, (page, error) in zip(missing, results):
+            if page is None:
+                errors.append((relays[i][0], error))
+            else:
+                cache.set(keys[i], page)
+                pages[i] = page
+            done += 1
+            if progress is not None:
+                progress(done, len(relays))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return pages, errors
+
+
+def _report_errors(errors):
+    """Logs the relays which could not be rendered."""
+    for relay, error in errors:
+        logger.warning(f"Relay {relay} could not be rendered: {error}")
+
+
+def _record_error(relay, error, relay_errors=None):
+    """Reports a relay which could not be rendered, appending it to `relay_errors` if given."""
+    errors = [(relay, str(error))]
+    _report_errors(errors)
+    if relay_errors is not None:
+        relay_errors.extend(errors)
+
+
+def _iter_rendered(relays, render, relay_errors=None):
+    """Yields `render(relay, group)` for each relay, reporting and skipping the relays which fail to render.
+
+    Args:
+        relays (iterable of tuple): (relay, group) pairs, in page order.
+        render (callable): Called with a relay and its group, returns what is yielded for the relay.
+        relay_errors (list, optional): List to which a (relay, error message) tuple is appended for each relay
+            which could not be rendered. Defaults to None.
+
+    Yields:
+        object: The result of `render` for each relay which could be rendered.
+    """
+    for relay, group in relays:
+        try:
+            yield render(relay, group)
+        except Exception as e:
+            _record_error(relay, e, relay_errors)
+
+
+def _start(parts, rendered):
+    """Produces the first part of a lazily generated document, so that a document without any page is never sent.
+
+    Args:
+        parts (generator of bytes): The successive parts of the document.
+        rendered (callable): Returns the number of pages rendered so far.
+
+    Raises:
+        RenderError: If the first part was produced without rendering any page.
+
+    Returns:
+        iterator of bytes: The successive parts of the document, starting with the part already produced.
+    """
+    first = next(parts)
+    if not rendered():
+        parts.close()
+        raise RenderError()
+    return itertools.chain((first,), parts)
+
+
+def _relay_svg(relay, group, params):
+    """Returns a relay and its SVG document."""
+    return relay, generate_svg_for_relay(relay, group, **params)
+
+
+def _iter_document(grouped_sets, relay_errors=None):
+    """Lazily generates a PDF document with the pages of one or more sets of relays, drawn on a single surface.
+
+    A relay which fails to be converted to SVG or drawn is reported and skipped. The first page is rendered before
+    this function returns.
+
+    Args:
+        grouped_sets (iterable of tuple): (grouped_data, params) pairs, in page order.
+        relay_errors (list, optional): List to which a (relay, error message) tuple is appended for each relay
+            which could not be rendered. Defaults to None.
+
+    Raises:
+        RenderError: If no relay could be rendered.
+
+    Returns:
+        iterator of bytes: The successive parts of the PDF document.
+    """
+    relays = []  # The relay of each SVG document given to cairo
+    failed = []
+
+    def generate_svgs():
+        for grouped_data, params in grouped_sets:
+            for relay, svg in _iter_rendered(grouped_data.items(), partial(_relay_svg, params=params), relay_errors):
+                relays.append(relay)
+                yield svg
+
+    def on_error(index, error):
+        failed.append(index)
+        _record_error(relays[index], error, relay_errors)
+
+    return _start(iter_pdf_from_svgs(generate_svgs(), on_error), lambda: len(relays) - len(failed))
+
+
+def generate_climbing_route_charts(
+    csv_string,
+    params=None,
+    workers=None,
+    cache=None,
+    warnings=None,
+    progress=None,
+    raise_errors=False,
+    relay_errors=None,
+):
     """Generates a PDF document containing pie charts for indoor climbing routes from CSV data.
 
     This function reads CSV data, processes it, and generates a multi-page PDF document. Each page of the PDF
     contains a pie chart representing the distribution of climbing routes for a particular relay. The charts
     illustrate route grades and associated route setters with varying colors.
 
-    In case of an error during processing, the function will print an error message and return `None`.
+    When `workers` is greater than 1, the relays are split into contiguous chunks which are rendered by a pool
+    of worker processes, then merged back in their original order.
+
+    When a `cache` is given, each relay is rendered to its own page, which is looked up in and stored to the
+    cache, so that only the relays which changed since a previous call are rendered again.
+
+    A relay which fails to render is logged, appended to `relay_errors` and skipped. In case of any other error
+    during processing, the function logs the error and returns `None`, unless `raise_errors` is True.
 
     Args:
-        csv_string (str): A string containing CSV formatted data.
+        csv_string (str, os.PathLike, file object, iterable of str or dict): A string containing CSV formatted
+            data, the path of a CSV file, a file object or iterable of CSV lines, or routes already grouped by
+            relay (e.g. as returned by `ingest_csv`). See `load_routes`.
         params (dict, optional): A dictionary of parameters to customize the charts.
             Possible keys include 'title_fs', 'grade_fs', 'setter_fs', and 'radius'.
             If None, default values are used. Defaults to None.
+        workers (int, optional): Number of worker processes used to render the relays. If None or 1, the
+            relays are rendered in the current process. Defaults to None.
+        cache (RenderCache, optional): Cache of rendered pages. Defaults to None.
+        warnings (list, optional): List to which an `UnknownColor` diagnostic is appended for each color
+            name which was not found. Defaults to None.
+        progress (callable, optional): Called with the number of relays rendered so far and the total number
+            of relays, as the rendering progresses. Defaults to None.
+        raise_errors (bool, optional): Whether an error is raised to the caller, e.g. to report its cause, rather
+            than logged. Defaults to False.
+        relay_errors (list, optional): List to which a (relay, error message) tuple is appended for each relay
+            which could not be rendered, so that the pages of the document are known. Defaults to None.
+
+    Raises:
+        Exception: The error which occurred during processing, if `raise_errors` is True.
 
     Returns:
         io.BytesIO or None: A byte stream containing the generated PDF document, or `None` if an
         error occurred during processing.
     """
     try:
-        # Ensure params is a dictionary
-        if params is None:
-            params = {}
+        with stage("document") as counts:
+            # Ensure params is a dictionary
+            if params is None:
+                params = {}
 
-        csv_string_io = io.StringIO(csv_string)
-        climbing_data = process_csv(csv_string_io)
+            # Read data, grouped by 'Relais'
+            grouped_data = load_routes(csv_string, warnings)
 
-        # Group data by 'Relais'
-        grouped_data = {}
-        for data in climbing_data:
-            relay = data["Relais"]
-            if relay not in grouped_data:
-                grouped_data[relay] = []
-            grouped_data[relay].append(data)
-            # TODO: exclude relais
+            # Compute the geometry of all the pie charts at once (worker processes inherit it)
+            compute_batch_geometry(grouped_data, params.get("radius", constants.RADIUS))
 
-        # Generate SVG for each 'Relais' group using the parameters
-        svg_list = [generate_svg_for_relay(relay, group, **params) for relay, group in grouped_data.items()]
+            relays = list(grouped_data.items())
 
-        # Generate a multi-page PDF file with all the SVGs
-        pdf_stream = generate_pdf_from_svgs(svg_list)
+            if cache is not None:
+                pages, errors = render_cached_pages(relays, params, cache, workers, progress)
+                pdf_list = [page for page in pages if page is not None]
+                pdf_bytes = merge_pdfs(pdf_list).getvalue() if pdf_list else None
+            elif workers is None or workers <= 1 or len(relays) <= 1:
+                pdf_bytes, errors = render_relays(relays, params, progress)
+            else:
+                # Split relays into contiguous chunks, one per worker, to keep the page order when merging
+                chunk_size = math.ceil(len(relays) / workers)
+                chunks = [relays[start : start + chunk_size] for start in range(0, len(relays), chunk_size)]
+                results = []
+                with ProcessPoolExecutor(max_workers=len(chunks)) as executor:
+                    for chunk, result in zip(chunks, executor.map(render_relays, chunks, [params] * len(chunks))):
+                        results.append(result)
+                        if progress is not None:
+                            progress(sum(len(chunk) for chunk in chunks[: len(results)]), len(relays))
 
-        return pdf_stream
+                errors = [error for _, chunk_errors in results for error in chunk_errors]
+                pdf_list = [chunk_pdf for chunk_pdf, _ in results if chunk_pdf is not None]
+                pdf_bytes = merge_pdfs(pdf_list).getvalue() if pdf_list else None
 
-    except Exception as e:
-        print("An error occurred while generating the charts.")
-        print(e)
+            _report_errors(errors)
+            if relay_errors is not None:
+                relay_errors.extend(errors)
+
+            if pdf_bytes is None:
+                raise RenderError()
+
+            counts["relays"] = len(relays)
+            counts["bytes"] = len(pdf_bytes)
+        return io.BytesIO(pdf_bytes)
+
+    except Exception:
+        if raise_errors:
+            raise
+        logger.exception("An error occurred while generating the charts.")
         return None
+
+
+def iter_climbing_route_charts(csv_string, params=None, cache=None, warnings=None, relay_errors=None):
+    """Lazily generates the PDF document of climbing route charts, one relay at a time.
+
+    The CSV data is parsed and validated immediately, and the first page is rendered, so that invalid input or a
+    document without any page raises before any output is produced. The returned iterator then renders each relay
+    only when the next part of the document is requested, which keeps memory usage close to a single page. This is
+    suited to streaming the document, e.g. as a chunked HTTP response.
+
+    When a `cache` is given, whole documents are looked up in it: a cached document is produced as a single
+    part, and a document which is not cached is still streamed page by page, then stored in the cache once it
+    has been produced entirely, unless a relay could not be rendered.
+
+    A relay which fails to render is logged, appended to `relay_errors` and skipped.
+
+    Args:
+        csv_string (str, os.PathLike, file object, iterable of str or dict): A string containing CSV formatted
+            data, the path of a CSV file, a file object or iterable of CSV lines, or routes already grouped by
+            relay (e.g. as returned by `ingest_csv`). See `load_routes`.
+        params (dict, optional): A dictionary of parameters to customize the charts.
+            Possible keys include 'title_fs', 'grade_fs', 'setter_fs', and 'radius'.
+            If None, default values are used. Defaults to None.
+        cache (RenderCache, optional): Cache of rendered documents, keyed by `document_cache_key`. Defaults to
+            None.
+        warnings (list, optional): List to which an `UnknownColor` diagnostic is appended for each color
+            name which was not found. It is filled before this function returns. Defaults to None.
+        relay_errors (list, optional): List to which a (relay, error message) tuple is appended for each relay
+            which could not be rendered. It is filled as the document is produced. Defaults to None.
+
+    Raises:
+        ValueError: If the CSV data is missing one or more required columns or if the CSV is malformed.
+        RenderError: If no relay could be rendered.
+
+    Returns:
+        iterator of bytes: The successive parts of the PDF document, one per relay plus a final part.
+    """
+    # Ensure params is a dictionary
+    if params is None:
+        params = {}
+
+    grouped_data = load_routes(csv_string, warnings)
+    compute_batch_geometry(grouped_data, params.get("radius", constants.RADIUS))
+
+    if cache is None:
+        return _iter_document([(grouped_data, params)], relay_errors)
+
+    key = document_cache_key(grouped_data, params)
+    document = cache.get(key)
+    if document is not None:
+        return iter((document,))
+
+    if relay_errors is None:
+        relay_errors = []
+    failures = len(relay_errors)
+    parts = _iter_document([(grouped_data, params)], relay_errors)
+    return _cache_parts(parts, cache, key, lambda: len(relay_errors) == failures)
+
+
+def _cache_parts(parts, cache, key, complete):
+    """Yields the parts of a document and stores it in `cache` under `key` once it has been produced entirely.
+
+    The document is only stored if `complete()` then returns True, i.e. if no page is missing.
+    """
+    document = []
+    for part in parts:
+        document.append(part)
+        yield part
+    if complete():
+        cache.set(key, b"".join(document))
+
+
+def iter_climbing_route_archive(
+    csv_string, params=None, output_format="svg", dpi=constants.PNG_DPI, warnings=None, relay_errors=None
+):
+    """Lazily generates a ZIP archive of one image per relay, without producing a PDF document.
+
+    In 'svg' format, the images are the SVG documents of the relays, so no cairo work is needed at all. In 'png'
+    format, each SVG document is converted to a PNG image at the chosen resolution.
+
+    As with `iter_climbing_route_charts`, the CSV data is parsed and validated immediately and the first image is
+    rendered, then each relay is only rendered when the next part of the archive is requested. A relay which fails
+    to render is reported and skipped.
+
+    Args:
+        csv_string (str, os.PathLike, file object, iterable of str or dict): A string containing CSV formatted
+            data, the path of a CSV file, a file object or iterable of CSV lines, or routes already grouped by
+            relay (e.g. as returned by `ingest_csv`). See `load_routes`.
+        params (dict, optional): A dictionary of parameters to customize the charts.
+            Possible keys include 'title_fs', 'grade_fs', 'setter_fs', and 'radius'.
+            If None, default values are used. Defaults to None.
+        output_format (str, optional): Format of the images, 'svg' or 'png'. Defaults to 'svg'.
+        dpi (int, optional): Resolution of the PNG images. Defaults to `constants.PNG_DPI`.
+        warnings (list, optional): List to which an `UnknownColor` diagnostic is appended for each color
+            name which was not found. It is filled before this function returns. Defaults to None.
+        relay_errors (list, optional): List to which a (relay, error message) tuple is appended for each relay
+            which could not be rendered. It is filled as the archive is produced. Defaults to None.
+
+    Raises:
+        ValueError: If the format is not 'svg' or 'png', or if the CSV data is missing one or more required
+            columns or is malformed.
+        RenderError: If no relay could be rendered.
+
+    Returns:
+        iterator of bytes: The successive parts of the ZIP archive, one per relay plus a final part.
+    """
+    if output_format not in ("svg", "png"):
+        raise ValueError(f"Unknown image format '{output_format}', expected 'svg' or 'png'")
+
+    # Ensure params is a dictionary
+    if params is None:
+        params = {}
+
+    grouped_data = load_routes(csv_string, warnings)
+    compute_batch_geometry(grouped_data, params.get("radius", constants.RADIUS))
+
+    # Images are numbered by page, so a relay which fails leaves a gap
+    indexes = {relay: index for index, relay in enumerate(grouped_data, start=1)}
+
+    def render_image(relay, group):
+        svg = generate_svg_for_relay(relay, group, **params)
+        if output_format == "svg":
+            return image_name(indexes[relay], relay, "svg"), svg, True
+        return image_name(indexes[relay], relay, "png"), svg_to_png(svg, dpi), False
+
+    images = []
+
+    def generate_images():
+        for image in _iter_rendered(grouped_data.items(), render_image, relay_errors):
+            images.append(image[0])
+            yield image
+
+    return _start(iter_zip(generate_images()), lambda: len(images))
+
+
+def iter_climbing_route_batch(route_sets, output_format="pdf", cache=None, warnings=None, relay_errors=None):
+    """Lazily generates a single document from several sets of routes, each with its own chart parameters.
+
+    In 'pdf' format, the pages of every set are concatenated in a single PDF document. In 'zip' format, each set
+    is rendered to its own PDF document, and the documents are written to a ZIP archive as they are rendered.
+
+    As with `iter_climbing_route_charts`, every set is parsed and validated immediately and the first page is
+    rendered, so that invalid input raises before any output is produced, and all the sets share the geometry
+    and fonts. A set of which no relay could be rendered is left out of a 'zip' archive. In 'pdf' format, the
+    pages of every set are drawn on a single PDF surface and streamed as they are rendered, so the `cache` is not
+    used: cache the whole document instead, e.g. under `batch_cache_key`. In 'zip' format, the document of each
+    set is looked up in and stored to the `cache`, see `iter_climbing_route_charts`.
+
+    Args:
+        route_sets (list of tuple): (name, source, params) triples, in document order, where source is anything
+            accepted by `load_routes` and params a dictionary of parameters to customize the charts of the set
+            (or None), see `generate_climbing_route_charts`.
+        output_format (str, optional): 'pdf' for a single PDF document, or 'zip' for a ZIP archive of one PDF
+            document per set. Defaults to 'pdf'.
+        cache (RenderCache, optional): Cache of the rendered documents of the sets in 'zip' format, keyed by
+            `document_cache_key`. Defaults to None.
+        warnings (list, optional): List to which an `UnknownColor` diagnostic is appended for each color
+            name which was not found. It is filled before this function returns. Defaults to None.
+        relay_errors (list, optional): List to which a (relay, error message) tuple is appended for each relay
+            which could not be rendered. It is filled as the document is produced. Defaults to None.
+
+    Raises:
+        ValueError: If the format is not 'pdf' or 'zip', or if the CSV data of a set is missing one or more
+            required columns or is malformed.
+        RenderError: If no relay could be rendered.
+
+    Returns:
+        iterator of bytes: The successive parts of the document.
+    """
+    if output_format not in ("pdf", "zip"):
+        raise ValueError(f"Unknown batch format '{output_format}', expected 'pdf' or 'zip'")
+
+    loaded_sets = []
+    for name, source, params in route_sets:
+        params = params or {}
+        grouped_data = load_routes(source, warnings)
+        compute_batch_geometry(grouped_data, params.get("radius", constants.RADIUS))
+        loaded_sets.append((name, grouped_data, params))
+
+    if output_format == "zip":
+
+        documents = []
+
+        def generate_documents():
+            for index, (name, grouped_data, params) in enumerate(loaded_sets, start=1):
+                try:
+                    document = b"".join(iter_climbing_route_charts(grouped_data, params, cache, None, relay_errors))
+                except RenderError:
+                    # Its relays were reported as they failed
+                    continue
+                documents.append(name)
+                # PDF documents are already compressed
+                yield member_name(index, name, "pdf"), document, False
+
+        return _start(iter_zip(generate_documents()), lambda: len(documents))
+
+    return _iter_document([(grouped_data, params) for _, grouped_data, params in loaded_sets], relay_errors)
+
+
+def warm_up(params=None):
+    """Renders a throwaway chart, so that the rendering libraries, cairo and the fonts are loaded.
+
+    Call it before serving requests, e.g. in a server process before it forks its workers, so that the first
+    render is not slowed down by imports and font discovery, and the loaded state is shared by the workers.
+
+    Args:
+        params (dict, optional): Parameters of the charts which will be rendered. Defaults to None.
+    """
+    group = [
+        {"Couleur": ["#0000FF"], "Cotation": "5a", "Ouvreur": "A"},
+        {"Couleur": ["#FFFF00", "#000000"], "Cotation": "6b+", "Ouvreur": "B"},
+    ]
+    for engine in constants.SVG_ENGINES:
+        svg = generate_svg_for_relay("1", group, **dict(params or {}, engine=engine))
+    merge_pdfs([generate_pdf_from_svgs([svg]).getvalue()])
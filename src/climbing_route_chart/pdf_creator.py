@@ -1,37 +1,187 @@
+import functools
+import hashlib
 import io
+from collections import OrderedDict
 
-import cairosvg
-import PyPDF2
+from .instrumentation import stage
+
+# A4 format at 300 DPI
+DPI = 300
+PAGE_WIDTH = 2480  # A4 width in pixels at 300 DPI
+PAGE_HEIGHT = 3508  # A4 height in pixels at 300 DPI
+
+# Number of recent pages whose drawing is kept, so that a page repeated in the same document is not drawn again
+REPEATED_PAGES = 128
+
+
+@functools.lru_cache(maxsize=None)
+def _page_surface_class():
+    """Returns the `_PageSurface` class, defined on first use so that CairoSVG is only imported to render."""
+    import cairocffi
+    from cairosvg.surface import PDFSurface
+
+    class _PageSurface(PDFSurface):
+        """CairoSVG surface drawing one page onto a shared multi-page cairo PDF surface.
+
+        CairoSVG creates a new cairo surface for each converted document. This subclass records the drawing of
+        the page instead, and replays it onto an existing `cairocffi.PDFSurface` when finished, so that every page
+        is written to the same PDF document and cairo can share fonts and other resources between pages. As
+        nothing is written until the page is completely drawn, a page which fails to draw can be skipped.
+        """
+
+        def __init__(self, tree, pdf_surface):
+            self.pdf_surface = pdf_surface
+            super().__init__(tree, None, DPI, output_width=PAGE_WIDTH, output_height=PAGE_HEIGHT)
+
+        def _create_surface(self, width, height):
+            self.page_size = width, height
+            return cairocffi.RecordingSurface(cairocffi.CONTENT_COLOR_ALPHA, (0, 0, width, height)), width, height
+
+        def finish(self):
+            _show_page(self.pdf_surface, self.cairo, self.page_size)
+
+    return _PageSurface
+
+
+def _show_page(pdf_surface, recording, page_size):
+    """Replays a recorded page onto a new page of a cairo PDF surface."""
+    import cairocffi
+
+    pdf_surface.set_size(*page_size)
+    context = cairocffi.Context(pdf_surface)
+    context.set_source_surface(recording)
+    context.paint()
+    context.show_page()
+
+
+def iter_pdf_from_svgs(svgs, on_error=None):
+    """Lazily generates a multi-page PDF document from SVG strings, one page at a time.
+
+    Each SVG string is drawn as a new page of a single cairo PDF surface using CairoSVG. The bytes written
+    by cairo are yielded as soon as each page is complete, so that the document can be streamed without
+    holding it in memory. Fonts and other resources are embedded once, in the last chunk. The generated
+    PDF is intended to be in A4 format with a resolution of 300 DPI.
+
+    A page identical to one of the last `REPEATED_PAGES` pages, e.g. the same relay in several sets of a batch, is
+    not drawn again: the recorded drawing is replayed, and cairo writes its content to the document only once.
+
+    Args:
+        svgs (iterable of str): SVG-formatted strings to be converted to PDF, one per page. The iterable
+            is consumed lazily.
+        on_error (callable, optional): Called with the index of an SVG string in `svgs` and the exception
+            raised while drawing it. The page is then skipped and the document goes on with the next one. If
+            None, the exception is raised. Defaults to None.
+
+    Yields:
+        bytes: The next part of the PDF document.
+    """
+    # Cairo and CairoSVG are only imported when a document is rendered
+    import cairocffi
+    from cairosvg.parser import Tree
+
+    page_surface_class = _page_surface_class()
+    buffer = io.BytesIO()
+    pdf_surface = cairocffi.PDFSurface(buffer, PAGE_WIDTH * 72 / DPI, PAGE_HEIGHT * 72 / DPI)
+    recordings = OrderedDict()
+
+    for index, svg in enumerate(svgs):
+        with stage("pdf") as counts:
+            svg_bytes = svg.encode("utf-8")
+            digest = hashlib.sha256(svg_bytes).digest()
+            recording = recordings.get(digest)
+            if recording is None:
+                try:
+                    page = page_surface_class(Tree(bytestring=svg_bytes), pdf_surface)
+                except Exception as e:
+                    if on_error is None:
+                        raise
+                    on_error(index, e)
+                    continue
+                recording = recordings[digest] = page.cairo, page.page_size
+                if len(recordings) > REPEATED_PAGES:
+                    recordings.popitem(last=False)
+            else:
+                recordings.move_to_end(digest)
+                counts["repeated"] = 1
+            _show_page(pdf_surface, *recording)
+            part = _drain(buffer)
+            counts["pages"] = 1
+            counts["bytes"] = len(part)
+        yield part
+
+    with stage("pdf") as counts:
+        pdf_surface.finish()
+        part = _drain(buffer)
+        counts["bytes"] = len(part)
+    yield part
+
+
+def _drain(buffer):
+    """Returns the content of a BytesIO buffer and empties it."""
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
 
 
 def generate_pdf_from_svgs(svg_list):
     """Generates a multi-page PDF document from a list of SVG strings.
 
-    This function converts each SVG string in the provided list to a PDF page using CairoSVG.
-    These pages are then combined into a single PDF document using PyPDF2. The generated PDF is
-    intended to be in A4 format with a resolution of 300 DPI.
+    This function draws each SVG string in the provided list as a new page of a single cairo PDF surface
+    using CairoSVG (see `iter_pdf_from_svgs`). Fonts and other resources are embedded once and shared
+    between pages. The generated PDF is intended to be in A4 format with a resolution of 300 DPI.
 
     Args:
-        svg_list (list of str): A list of SVG-formatted strings to be converted to PDF.
+        svg_list (iterable of str): SVG-formatted strings to be converted to PDF, one per page.
 
     Returns:
         io.BytesIO: A byte stream containing the generated multi-page PDF document.
     """
-    pdf_writer = PyPDF2.PdfWriter()
     pdf_stream = io.BytesIO()
+    for chunk in iter_pdf_from_svgs(svg_list):
+        pdf_stream.write(chunk)
+    pdf_stream.seek(0)
+    return pdf_stream
+
+
+def merge_pdfs(pdf_list, dedupe=True):
+    """Concatenates several PDF documents into a single one.
+
+    This is used to join documents rendered independently, e.g. the chunks of relays rendered by worker
+    processes. Each chunk already shares its fonts between its own pages, so only a handful of documents
+    need to be merged.
+
+    Identical documents, e.g. the page of a relay repeated in several sets, are only read once, so that their
+    pages share the same content stream and resources. When `dedupe` is True, identical objects embedded by
+    several documents, e.g. fonts, are then written only once, and the objects left unused are dropped.
+
+    Args:
+        pdf_list (list of bytes): PDF documents to concatenate, in page order.
+        dedupe (bool, optional): Whether identical objects are written only once. Defaults to True.
+
+    Returns:
+        io.BytesIO: A byte stream containing the merged PDF document.
+    """
+    import pypdf
+
+    with stage("merge") as counts:
+        pdf_writer = pypdf.PdfWriter()
+        pdf_stream = io.BytesIO()
+
+        readers = {}
+        for pdf_bytes in pdf_list:
+            digest = hashlib.sha256(pdf_bytes).digest()
+            pdf_reader = readers.get(digest)
+            if pdf_reader is None:
+                pdf_reader = readers[digest] = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+            for page in pdf_reader.pages:
+                pdf_writer.add_page(page)
+
+        if dedupe and len(readers) > 1:
+            pdf_writer.compress_identical_objects()
 
-    for svg in svg_list:
-        svg_bytes = cairosvg.svg2pdf(
-            bytestring=svg.encode("utf-8"),
-            dpi=300,
-            output_width=2480,  # A4 width in pixels at 300 DPI
-            output_height=3508,  # A4 height in pixels at 300 DPI
-        )
-        svg_stream = io.BytesIO(svg_bytes)
-        pdf_reader = PyPDF2.PdfReader(svg_stream)
-        for page in pdf_reader.pages:
-            pdf_writer.add_page(page)
-
-    pdf_writer.write(pdf_stream)
+        pdf_writer.write(pdf_stream)
+        counts["pages"] = len(pdf_writer.pages)
+        counts["bytes"] = pdf_stream.tell()
     pdf_stream.seek(0)
     return pdf_stream
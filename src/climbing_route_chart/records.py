@@ -0,0 +1,77 @@
+import sys
+
+from .utils import color_spec
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Route:
+    """A climbing route, as read from one row of the CSV data.
+
+    Routes are compact: they only hold the relay, grade and setter (interned, as they are repeated across
+    rows) and a reference to the resolved `ColorSpec`, which is shared by all the routes of the same color.
+
+    For compatibility with the processed rows of previous versions, a route can also be read like a dict
+    with the 'Relais', 'Couleur', 'Cotation' and 'Ouvreur' keys.
+    """
+
+    __slots__ = ("relay", "grade", "setter", "color")
+
+    KEYS = {"Relais": "relay", "Cotation": "grade", "Ouvreur": "setter"}
+
+    def __init__(self, relay, grade, setter, color):
+        """Initialises a route.
+
+        Args:
+            relay (str): Identifier of the relay of the route.
+            grade (str): Grade of the route.
+            setter (str): Name of the route setter.
+            color (ColorSpec): Resolved color of the route.
+        """
+        self.relay = _intern(relay)
+        self.grade = _intern(grade)
+        self.setter = _intern(setter)
+        self.color = color
+
+    @classmethod
+    def from_dict(cls, row):
+        """Creates a route from a processed row, whose 'Couleur' is a list of hex codes."""
+        return cls(row.get("Relais"), row["Cotation"], row["Ouvreur"], color_spec(tuple(row["Couleur"])))
+
+    def __getitem__(self, key):
+        if key == "Couleur":
+            return list(self.color.hex_codes)
+        return getattr(self, self.KEYS[key])
+
+    def keys(self):
+        return ["Relais", "Couleur", "Cotation", "Ouvreur"]
+
+    def __eq__(self, other):
+        if not isinstance(other, Route):
+            return NotImplemented
+        return (self.relay, self.grade, self.setter, self.color.hex_codes) == (
+            other.relay,
+            other.grade,
+            other.setter,
+            other.color.hex_codes,
+        )
+
+    def __hash__(self):
+        return hash((self.relay, self.grade, self.setter, self.color.hex_codes))
+
+    def __repr__(self):
+        return f"Route({self.relay!r}, {self.grade!r}, {self.setter!r}, {list(self.color.hex_codes)!r})"
+
+
+def as_routes(group):
+    """Returns the routes of a group, converting processed rows (dicts) to `Route` objects if needed.
+
+    Args:
+        group (list of Route or dict): The routes of a relay.
+
+    Returns:
+        list of Route: The routes of the relay.
+    """
+    return [route if isinstance(route, Route) else Route.from_dict(route) for route in group]
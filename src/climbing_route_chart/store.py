@@ -0,0 +1,201 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+from .records import Route, as_routes
+from .utils import color_spec
+
+# Separator of the hex codes of a route's colors in the store
+COLOR_SEPARATOR = "/"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS relays (
+    relay TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    number INTEGER,
+    digest TEXT NOT NULL,
+    modified REAL NOT NULL,
+    printed REAL
+);
+CREATE TABLE IF NOT EXISTS routes (
+    relay TEXT NOT NULL REFERENCES relays (relay) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    grade TEXT NOT NULL,
+    setter TEXT NOT NULL,
+    colors TEXT NOT NULL,
+    PRIMARY KEY (relay, position)
+);
+CREATE INDEX IF NOT EXISTS relays_number ON relays (number);
+CREATE INDEX IF NOT EXISTS relays_modified ON relays (modified);
+CREATE INDEX IF NOT EXISTS routes_setter ON routes (setter);
+CREATE INDEX IF NOT EXISTS routes_grade ON routes (grade);
+"""
+
+
+def _relay_number(relay):
+    """Returns the relay identifier as an integer, or None if it is not a number, for range queries."""
+    try:
+        return int(relay)
+    except (TypeError, ValueError):
+        return None
+
+
+def _routes_digest(group):
+    """Returns a hash of what is stored of the routes of a relay, their grades, setters and colors, in order."""
+    rows = [[route.grade, route.setter, list(route.color.hex_codes)] for route in group]
+    return hashlib.sha256(json.dumps(rows, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class RouteStore:
+    """Routes of a gym stored in an SQLite database, so that a subset of the relays can be rendered.
+
+    Routes are imported from the output of `read_routes` or `ingest_csv`, with their colors already resolved,
+    and read back as `Route` records grouped by relay, without parsing the CSV data again. Each relay records
+    when its routes last changed and when it was last printed, and the routes are indexed by relay number,
+    setter and grade.
+
+    The selected routes can be passed as is to `generate_climbing_route_charts` or `iter_climbing_route_charts`,
+    e.g. to only reprint the relays which changed since they were last printed.
+    """
+
+    def __init__(self, path=":memory:"):
+        """Opens the store, creating its tables if needed.
+
+        Args:
+            path (str or os.PathLike, optional): Filepath of the SQLite database. Defaults to ':memory:', an
+                in-memory database which is discarded when the store is closed.
+        """
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the database."""
+        self._connection.close()
+
+    def import_routes(self, grouped_data, modified=None, partial=False):
+        """Stores routes grouped by relay, only updating the relays whose routes changed.
+
+        Args:
+            grouped_data (dict): A mapping of relay identifier to the list of its routes, e.g. as returned by
+                `read_routes`, in page order.
+            modified (float, optional): Modification time recorded for the changed relays, as returned by
+                `time.time`. Defaults to now.
+            partial (bool, optional): If False, the routes describe the whole gym, and the stored relays which
+                are missing from them are removed. If True, they are kept. Defaults to False.
+
+        Returns:
+            list of str: The identifiers of the relays which were added or changed.
+        """
+        modified = time.time() if modified is None else modified
+        changed = []
+        with self._connection:
+            digests = dict(self._connection.execute("SELECT relay, digest FROM relays"))
+            for position, (relay, group) in enumerate(grouped_data.items()):
+                relay = str(relay)
+                group = as_routes(group)
+                digest = _routes_digest(group)
+                if digests.pop(relay, None) == digest:
+                    self._connection.execute("UPDATE relays SET position = ? WHERE relay = ?", (position, relay))
+                    continue
+
+                changed.append(relay)
+                self._connection.execute(
+                    "INSERT INTO relays (relay, position, number, digest, modified) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (relay) DO UPDATE SET position = excluded.position, digest = excluded.digest, "
+                    "modified = excluded.modified",
+                    (relay, position, _relay_number(relay), digest, modified),
+                )
+                self._connection.execute("DELETE FROM routes WHERE relay = ?", (relay,))
+                self._connection.executemany(
+                    "INSERT INTO routes (relay, position, grade, setter, colors) VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (relay, index, route.grade, route.setter, COLOR_SEPARATOR.join(route.color.hex_codes))
+                        for index, route in enumerate(group)
+                    ],
+                )
+
+            if not partial:
+                self._connection.executemany("DELETE FROM relays WHERE relay = ?", [(relay,) for relay in digests])
+        return changed
+
+    def select(self, relays=None, ranges=None, setter=None, grade=None, changed_since=None, unprinted=False):
+        """Returns the routes of the relays matching every given criterion, grouped by relay in page order.
+
+        Relays are always returned with all their routes: a relay matches `setter` or `grade` if any of its
+        routes does.
+
+        Args:
+            relays (iterable of str, optional): Identifiers of the relays to select. Defaults to None.
+            ranges (iterable of tuple, optional): (first, last) pairs of relay numbers to select, inclusive; a
+                relay is selected if it is listed in `relays` or falls in one of the ranges. Defaults to None.
+            setter (str, optional): Name of a route setter. Defaults to None.
+            grade (str, optional): A route grade. Defaults to None.
+            changed_since (float, optional): Only select the relays which changed after this time, as returned
+                by `time.time`. Defaults to None.
+            unprinted (bool, optional): Only select the relays which changed since they were last printed, see
+                `mark_printed`. Defaults to False.
+
+        Returns:
+            dict: A mapping of relay identifier to the list of its `Route` records.
+        """
+        conditions = []
+        values = []
+        alternatives = []
+        if relays is not None:
+            relays = list(relays)
+            alternatives.append(f"relay IN ({', '.join('?' * len(relays))})")
+            values.extend(relays)
+        for first, last in ranges or ():
+            alternatives.append("number BETWEEN ? AND ?")
+            values.extend((first, last))
+        if relays is not None or ranges is not None:
+            conditions.append(f"({' OR '.join(alternatives) or '0'})")
+        for column, value in (("setter", setter), ("grade", grade)):
+            if value is not None:
+                conditions.append(f"relay IN (SELECT relay FROM routes WHERE {column} = ?)")
+                values.append(value)
+        if changed_since is not None:
+            conditions.append("modified > ?")
+            values.append(changed_since)
+        if unprinted:
+            conditions.append("(printed IS NULL OR modified > printed)")
+
+        query = (
+            "SELECT routes.relay, grade, setter, colors FROM routes JOIN relays USING (relay) "
+            f"WHERE relay IN (SELECT relay FROM relays WHERE {' AND '.join(conditions) or '1'}) "
+            "ORDER BY relays.position, routes.position"
+        )
+        grouped_data = {}
+        for relay, route_grade, route_setter, colors in self._connection.execute(query, values):
+            route = Route(relay, route_grade, route_setter, color_spec(tuple(colors.split(COLOR_SEPARATOR))))
+            group = grouped_data.get(relay)
+            if group is None:
+                group = grouped_data[relay] = []
+            group.append(route)
+        return grouped_data
+
+    def mark_printed(self, relays, printed=None):
+        """Records that relays were printed, so that `select(unprinted=True)` skips them until they change.
+
+        Args:
+            relays (iterable of str): Identifiers of the printed relays.
+            printed (float, optional): Time at which they were printed, as returned by `time.time`. Defaults to
+                now.
+        """
+        printed = time.time() if printed is None else printed
+        with self._connection:
+            self._connection.executemany(
+                "UPDATE relays SET printed = ? WHERE relay = ?", [(printed, str(relay)) for relay in relays]
+            )
+
+    def relay_count(self):
+        """Returns the number of stored relays."""
+        return self._connection.execute("SELECT COUNT(*) FROM relays").fetchone()[0]
@@ -1,12 +1,13 @@
-import math
-
-import drawsvg as draw
+from xml.sax.saxutils import escape
 
 from . import constants
-from .utils import is_dark_color
+from .font_metrics import FONT_FAMILY, fit_label
+from .geometry import CENTER_X, CENTER_Y, label_width, pie_geometry, slice_frames
+from .instrumentation import stage
+from .records import Route, as_routes
 
 
-def determine_colors(route, x1, y1, x2, y2):
+def determine_colors(route, x1, y1, x2, y2, gradients=None):
     """Determines the fill and text colors for a pie chart slice based on the route's color.
 
     For routes with multiple colors (indicating a gradient), it creates a linear gradient fill.
@@ -14,49 +15,97 @@ def determine_colors(route, x1, y1, x2, y2):
     appropriate text color (either black or white) for readability based on the fill color's luminance.
 
     Args:
-        route (pd.Series): The data series representing a single climbing route.
+        route (Route or dict): A single climbing route.
         x1 (float): The x-coordinate of the start point for the gradient.
         y1 (float): The y-coordinate of the start point for the gradient.
         x2 (float): The x-coordinate of the end point for the gradient.
         y2 (float): The y-coordinate of the end point for the gradient.
+        gradients (dict, optional): Gradients already created for the drawing, by colors and coordinates. A
+            gradient found in it is reused, so that it is only defined once, and new gradients are added to it.
+            Defaults to None.
 
     Returns:
         tuple: A tuple containing the text color and the path fill (either a single color or a gradient).
     """
+    # drawsvg is only imported when it is used, the 'template' engine does not need it
+    import drawsvg as draw
+
+    if not isinstance(route, Route):
+        route = Route.from_dict(route)
+    colors = route.color.hex_codes
+
     # Determine fill color
-    if len(route["Couleur"]) > 1:
-        # Create gradient
-        gradient = draw.LinearGradient(x1, y1, x2, y2)
-        for i, color in enumerate(route["Couleur"]):
-            offset = i / (len(route["Couleur"]) - 1)
-            gradient.add_stop(offset, color)
+    if len(colors) > 1:
+        key = (colors, x1, y1, x2, y2)
+        gradient = gradients.get(key) if gradients is not None else None
+        if gradient is None:
+            # Create gradient
+            gradient = draw.LinearGradient(x1, y1, x2, y2)
+            for i, color in enumerate(colors):
+                offset = i / (len(colors) - 1)
+                gradient.add_stop(offset, color)
+            if gradients is not None:
+                gradients[key] = gradient
         path_fill = gradient
     else:
         # Single color
-        path_fill = route["Couleur"][0]
+        path_fill = colors[0]
 
-    # Determine text color
-    if len(route["Couleur"]) > 1:
-        # Gradient case
-        text_color = "white"  # Default to white for gradients
-    else:
-        # Single color
-        path_fill = route["Couleur"][0]
-        text_color = "white" if is_dark_color(path_fill) else "black"
+    # Determine text color (white for gradients, depends on luminance for single colors)
+    text_color = route.color.text_color
 
     return text_color, path_fill
 
 
+def layout_labels(route, text_y, max_width, grade_fs, setter_fs):
+    """Lays out the grade and setter labels of a slice, fitted to the width available in the slice.
+
+    The labels are measured with the glyph advances of `font_metrics`, and shrunk or wrapped by `fit_label`. The
+    setter is drawn below the grade, `constants.SETTER_OFFSET` mm apart, or proportionally less when they are
+    shrunk.
+
+    Args:
+        route (Route): The route of the slice.
+        text_y (float): The y-coordinate of the label anchor of the slice.
+        max_width (float): The width available to the labels.
+        grade_fs (int): Font size for the grade label.
+        setter_fs (int): Font size for the route setter name.
+
+    Returns:
+        list of tuple: The (text, y-coordinate, font size) of each line, the grade first.
+    """
+    grade_lines, grade_size = fit_label(route.grade, grade_fs, max_width, grade_fs * constants.LABEL_MIN_SCALE)
+    setter_lines, setter_size = fit_label(route.setter, setter_fs, max_width, setter_fs * constants.LABEL_MIN_SCALE)
+
+    offset = constants.SETTER_OFFSET
+    if (grade_size, setter_size) != (grade_fs, setter_fs):
+        offset = round(offset * (grade_size + setter_size) / (grade_fs + setter_fs), 2)
+
+    lines = [
+        (line, text_y + i * grade_size * constants.LINE_SPACING, grade_size) for i, line in enumerate(grade_lines)
+    ]
+    setter_y = lines[-1][1] + offset
+    lines += [
+        (line, setter_y + i * setter_size * constants.LINE_SPACING, setter_size) for i, line in enumerate(setter_lines)
+    ]
+    return lines
+
+
 def add_pie_chart_to_svg(drawing, group, center_x, center_y, radius, grade_fs, setter_fs):
     """Adds a pie chart to an SVG drawing based on climbing route data.
 
     This function creates a pie chart for a given group of climbing routes, adding it to an existing SVG drawing.
     It handles both single-color and gradient fills for the pie slices and adjusts the text color for readability
-    based on the background color. The pie chart visualizes the distribution of climbing routes.
+    based on the background color. The pie chart visualizes the distribution of climbing routes. The labels are
+    drawn with the font of `font_metrics` and fitted to the chord of their slice, see `layout_labels`.
+
+    Slices filled with a gradient are drawn in their `SliceFrame`, so that a single gradient is defined for all
+    the slices with the same colors.
 
     Args:
         drawing (draw.Drawing): The SVG drawing object to which the pie chart will be added.
-        group (list of dict): The group of climbing routes data, where each route is represented as a dictionary.
+        group (list of Route or dict): The group of climbing routes data, where each route is represented as a
+            `Route` or a dictionary.
         center_x (float): The x-coordinate of the center of the pie chart.
         center_y (float): The y-coordinate of the center of the pie chart.
         radius (float): The radius of the pie chart.
@@ -69,97 +118,248 @@ def add_pie_chart_to_svg(drawing, group, center_x, center_y, radius, grade_fs, s
     Returns:
         None: The function adds components to the SVG drawing but does not return anything.
     """
+    import drawsvg as draw
+
+    group = as_routes(group)
     num_routes = len(group)
     if num_routes == 0:
         return  # No routes to display
 
-    if num_routes == 1:
-        route = group[0]
-        x1, y1 = center_x - radius, center_y
-        x2, y2 = center_x + radius, center_y
-        text_color, path_fill = determine_colors(route, x1, y1, x2, y2)
-        text_y = center_y - radius / 2
-        drawing.append(draw.Circle(center_x, center_y, radius, fill=path_fill, stroke_width=1, stroke="black"))
-        drawing.append(
-            draw.Text(text=route["Cotation"], font_size=grade_fs, x=center_x, y=text_y, center=0.5, fill=text_color)
-        )
-        drawing.append(
-            draw.Text(
-                text=route["Ouvreur"], font_size=setter_fs, x=center_x, y=text_y + 12, center=0.5, fill=text_color
+    gradients = {}
+    max_width = label_width(num_routes, radius) * constants.LABEL_WIDTH_RATIO
+    geometries = pie_geometry(num_routes, radius, center_x, center_y)
+    for route, geometry, frame in zip(group, geometries, slice_frames(num_routes, radius, center_x, center_y)):
+        x1, y1, x2, y2, text_x, text_y = geometry
+
+        if len(route.color.hex_codes) > 1:
+            # The gradient runs from (0, 0) to (1, 0) in the slice's frame, which maps them onto the arc
+            text_color, path_fill = determine_colors(route, 0, 0, 1, 0, gradients)
+            if num_routes == 1:
+                drawing.append(
+                    draw.Circle(
+                        frame.center_x,
+                        frame.center_y,
+                        frame.radius,
+                        fill=path_fill,
+                        stroke_width=frame.stroke_width,
+                        stroke="black",
+                        transform=frame.transform,
+                    )
+                )
+            else:
+                path = draw.Path(
+                    stroke_width=frame.stroke_width, stroke="black", fill=path_fill, transform=frame.transform
+                )
+                path.M(frame.center_x, frame.center_y)  # Move to center
+                path.L(0, 0)  # Line to first point on circumference
+                path.A(frame.radius, frame.radius, 0, 0, 1, 1, 0)  # Arc to second point
+                path.Z()  # Close path
+                drawing.append(path)
+        else:
+            text_color, path_fill = determine_colors(route, x1, y1, x2, y2)
+            if num_routes == 1:
+                drawing.append(draw.Circle(center_x, center_y, radius, fill=path_fill, stroke_width=1, stroke="black"))
+            else:
+                path = draw.Path(stroke_width=1, stroke="black", fill=path_fill)
+                path.M(center_x, center_y)  # Move to center
+                path.l(x1 - center_x, y1 - center_y)  # Line to first point on circumference
+                path.A(radius, radius, 0, 0, 1, x2, y2)  # Arc to second point
+                path.Z()  # Close path
+                drawing.append(path)
+
+        for text, y, font_size in layout_labels(route, text_y, max_width, grade_fs, setter_fs):
+            drawing.append(
+                draw.Text(
+                    text=text, font_size=font_size, x=text_x, y=y, center=0.5, fill=text_color, font_family=FONT_FAMILY
+                )
             )
-        )
-        return
-
-    start_angle = 0
-    for route in group:
-        sweep_angle = 360 / num_routes
-        end_angle = start_angle + sweep_angle
-        x1, y1 = center_x + radius * math.cos(math.radians(start_angle)), center_y + radius * math.sin(
-            math.radians(start_angle)
-        )
-        x2, y2 = center_x + radius * math.cos(math.radians(end_angle)), center_y + radius * math.sin(
-            math.radians(end_angle)
-        )
 
-        text_color, path_fill = determine_colors(route, x1, y1, x2, y2)
-
-        path = draw.Path(stroke_width=1, stroke="black", fill=path_fill)
-        path.M(center_x, center_y)  # Move to center
-        path.l(x1 - center_x, y1 - center_y)  # Line to first point on circumference
-        path.A(radius, radius, 0, 0, 1, x2, y2)  # Arc to second point
-        path.Z()  # Close path
-        drawing.append(path)
-
-        mid_angle = (start_angle + end_angle) / 2
-        text_radius_multiplier = 0.6
-        text_x = center_x + radius * text_radius_multiplier * math.cos(math.radians(mid_angle))
-        text_y = center_y + radius * text_radius_multiplier * math.sin(math.radians(mid_angle))
-        drawing.append(
-            draw.Text(text=route["Cotation"], font_size=grade_fs, x=text_x, y=text_y, center=0.5, fill=text_color)
-        )
-        drawing.append(
-            draw.Text(text=route["Ouvreur"], font_size=setter_fs, x=text_x, y=text_y + 12, center=0.5, fill=text_color)
-        )
 
-        start_angle = end_angle
+# Page template used by the 'template' engine. It reproduces the output of `draw.Drawing.as_svg()` in the version of
+# drawsvg pinned in requirements.txt, which the tests check: upgrading drawsvg may require updating the templates.
+PAGE_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"\n'
+    '     width="210" height="297" viewBox="0 0 210 297" displayInline="False">\n'
+    "<defs>\n{defs}</defs>\n"
+    '<text x="105" y="30" font-size="{title_fs}" valign="top" font-family="{font_family}" text-anchor="middle" '
+    'dominant-baseline="central">{title}</text>\n'
+    "{body}"
+    "</svg>"
+)
+CIRCLE_TEMPLATE = '<circle cx="{}" cy="{}" r="{}" fill="{}" stroke-width="1" stroke="black" />\n'
+SLICE_TEMPLATE = '<path d="M{},{} l{},{} A{},{},0,0,1,{},{} Z" stroke-width="1" stroke="black" fill="{}" />\n'
+GRADIENT_CIRCLE_TEMPLATE = (
+    '<circle cx="{}" cy="{}" r="{}" fill="{}" stroke-width="{}" stroke="black" transform="{}" />\n'
+)
+GRADIENT_SLICE_TEMPLATE = (
+    '<path d="M{},{} L0,0 A{},{},0,0,1,1,0 Z" stroke-width="{}" stroke="black" fill="{}" transform="{}" />\n'
+)
+TEXT_TEMPLATE = (
+    '<text x="{}" y="{}" font-size="{}" fill="{}" font-family="{}" text-anchor="middle" dominant-baseline="central">'
+    "{}</text>\n"
+)
+GRADIENT_TEMPLATE = '<linearGradient x1="{}" y1="{}" x2="{}" y2="{}" gradientUnits="userSpaceOnUse" id="{}">\n'
+STOP_TEMPLATE = '<stop offset="{}" stop-color="{}" />\n'
+
+
+def _format_fill(route, defs, gradient_ids):
+    """Returns the text color and the fill of a slice.
+
+    The gradient of a marbled route runs from (0, 0) to (1, 0) in the frame of its slice. It is appended to `defs`
+    the first time its colors are seen, and its id is recorded in `gradient_ids` for the next slices.
+    """
+    colors = route.color.hex_codes
+    if len(colors) > 1:
+        gradient_id = gradient_ids.get(colors)
+        if gradient_id is None:
+            gradient_id = gradient_ids[colors] = f"d{len(defs)}"
+            stops = "".join(STOP_TEMPLATE.format(i / (len(colors) - 1), color) for i, color in enumerate(colors))
+            defs.append(GRADIENT_TEMPLATE.format(0, 0, 1, 0, gradient_id) + stops + "</linearGradient>\n")
+        return "white", f"url(#{gradient_id})"
+    return route.color.text_color, colors[0]
+
+
+def _format_labels(route, text_x, text_y, text_color, max_width, grade_fs, setter_fs):
+    """Returns the grade and setter labels of a slice, see `layout_labels`."""
+    return "".join(
+        TEXT_TEMPLATE.format(text_x, y, font_size, text_color, FONT_FAMILY, escape(text))
+        for text, y, font_size in layout_labels(route, text_y, max_width, grade_fs, setter_fs)
+    )
+
+
+def generate_svg_from_template(relay, group, center_x, center_y, radius, title_fs, grade_fs, setter_fs):
+    """Generates the SVG of a relay by formatting strings, without building drawsvg objects.
+
+    This is the 'template' engine. Its output is identical to the one produced through drawsvg by
+    `add_pie_chart_to_svg`, but the page is written directly from `PAGE_TEMPLATE` and the precomputed
+    `pie_geometry` and `slice_frames` of the relay's route count.
+
+    Args:
+        relay (str): Identifier for the relay group.
+        group (list of Route or dicts): Data for the specific relay group.
+        center_x (float): The x-coordinate of the center of the pie chart.
+        center_y (float): The y-coordinate of the center of the pie chart.
+        radius (float): The radius of the pie chart.
+        title_fs (int): Font size for the title.
+        grade_fs (int): Font size for the grade labels in the pie chart.
+        setter_fs (int): Font size for the route setter names in the pie chart.
+
+    Returns:
+        str: An SVG formatted string representing the generated drawing.
+    """
+    group = as_routes(group)
+    defs = []
+    gradient_ids = {}
+    body = []
+    num_routes = len(group)
+    geometries = pie_geometry(num_routes, radius, center_x, center_y) if num_routes else ()
+    frames = slice_frames(num_routes, radius, center_x, center_y) if num_routes else ()
+    max_width = label_width(num_routes, radius) * constants.LABEL_WIDTH_RATIO if num_routes else 0
+
+    for route, geometry, frame in zip(group, geometries, frames):
+        x1, y1, x2, y2, text_x, text_y = geometry
+        text_color, path_fill = _format_fill(route, defs, gradient_ids)
+        if len(route.color.hex_codes) > 1:
+            if num_routes == 1:
+                body.append(
+                    GRADIENT_CIRCLE_TEMPLATE.format(
+                        frame.center_x, frame.center_y, frame.radius, path_fill, frame.stroke_width, frame.transform
+                    )
+                )
+            else:
+                body.append(
+                    GRADIENT_SLICE_TEMPLATE.format(
+                        frame.center_x,
+                        frame.center_y,
+                        frame.radius,
+                        frame.radius,
+                        frame.stroke_width,
+                        path_fill,
+                        frame.transform,
+                    )
+                )
+        elif num_routes == 1:
+            body.append(CIRCLE_TEMPLATE.format(center_x, center_y, radius, path_fill))
+        else:
+            body.append(
+                SLICE_TEMPLATE.format(
+                    center_x, center_y, x1 - center_x, y1 - center_y, radius, radius, x2, y2, path_fill
+                )
+            )
+        body.append(_format_labels(route, text_x, text_y, text_color, max_width, grade_fs, setter_fs))
+
+    return PAGE_TEMPLATE.format(
+        defs="".join(defs),
+        title_fs=title_fs,
+        font_family=FONT_FAMILY,
+        title=escape(f"Relais {relay}"),
+        body="".join(body),
+    )
 
 
 def generate_svg_for_relay(relay, group, **kwargs):
     """
     Generates an SVG drawing for a specific relay group.
 
+    Two engines produce the same drawing: 'drawsvg' builds it with drawsvg objects, while 'template'
+    formats the SVG directly (see `generate_svg_from_template`) and is faster for large batches.
+
     Args:
         relay (str): Identifier for the relay group.
-        group (list of dicts): Data for the specific relay group.
+        group (list of Route or dicts): Data for the specific relay group.
         **kwargs: Keyword arguments for customizing the chart. Acceptable keys are 'radius',
-                  'title_fs', 'grade_fs', 'setter_fs'.
+                  'title_fs', 'grade_fs', 'setter_fs' and 'engine'.
 
     Returns:
         str: An SVG formatted string representing the generated drawing.
     """
-    # Extract parameters with defaults
-    radius = kwargs.get("radius", constants.RADIUS)
-    title_fs = kwargs.get("title_fs", constants.TITLE_FS)
-    grade_fs = kwargs.get("grade_fs", constants.GRADE_FS)
-    setter_fs = kwargs.get("setter_fs", constants.SETTER_FS)
-
-    # Create a new SVG drawing
-    d = draw.Drawing(width=210, height=297, origin="top-left", displayInline=False)
-
-    # Add a title to the SVG
-    relay_name = f"Relais {relay}"
-    d.append(draw.Text(text=relay_name, font_size=title_fs, x=105, y=30, center=0.5, valign="top"))
-
-    # Draw the pie chart
-    add_pie_chart_to_svg(
-        d,
-        group,
-        center_x=105,
-        center_y=150,
-        radius=radius,
-        grade_fs=grade_fs,
-        setter_fs=setter_fs,
-    )
+    with stage("svg") as counts:
+        counts["relays"] = 1
+
+        # Extract parameters with defaults
+        radius = kwargs.get("radius", constants.RADIUS)
+        title_fs = kwargs.get("title_fs", constants.TITLE_FS)
+        grade_fs = kwargs.get("grade_fs", constants.GRADE_FS)
+        setter_fs = kwargs.get("setter_fs", constants.SETTER_FS)
+        engine = kwargs.get("engine", constants.SVG_ENGINE)
+
+        if engine not in constants.SVG_ENGINES:
+            raise ValueError(f"Unknown SVG engine '{engine}', expected one of {constants.SVG_ENGINES}")
+
+        # drawsvg lays out multi-line text with <tspan> elements, which the template engine does not handle
+        group = as_routes(group)
+        labels = [str(relay)] + [route.grade for route in group] + [route.setter for route in group]
+        if engine == "template" and not any("\n" in label for label in labels):
+            svg = generate_svg_from_template(relay, group, CENTER_X, CENTER_Y, radius, title_fs, grade_fs, setter_fs)
+            counts["bytes"] = len(svg)
+            return svg
+
+        import drawsvg as draw
+
+        # Create a new SVG drawing
+        d = draw.Drawing(width=210, height=297, origin="top-left", displayInline=False)
+
+        # Add a title to the SVG
+        relay_name = f"Relais {relay}"
+        d.append(
+            draw.Text(
+                text=relay_name, font_size=title_fs, x=105, y=30, center=0.5, valign="top", font_family=FONT_FAMILY
+            )
+        )
+
+        # Draw the pie chart
+        add_pie_chart_to_svg(
+            d,
+            group,
+            center_x=CENTER_X,
+            center_y=CENTER_Y,
+            radius=radius,
+            grade_fs=grade_fs,
+            setter_fs=setter_fs,
+        )
 
-    # Return SVG as a string
-    return d.as_svg()
+        # Return SVG as a string
+        svg = d.as_svg()
+        counts["bytes"] = len(svg)
+        return svg
@@ -1,14 +1,37 @@
+import functools
 import re
+from collections import namedtuple
 
 from .constants import COLOR_MAPPING
 
+# Color used for unknown color names
+DEFAULT_COLOR = "#808080"
+
+HEX_CODE_PATTERN = re.compile(r"^#[0-9A-Fa-f]{6}$")
+MARBLED_PATTERN = re.compile(r"MARBREE|MARBLES")
+
+# A resolved color: its hex codes (several for marbled routes), the color of text drawn over it, its luminance
+# (None for marbled routes) and the names which were not found and replaced by `DEFAULT_COLOR`
+ColorSpec = namedtuple("ColorSpec", ["hex_codes", "text_color", "luminance", "unknown"])
+
+# Diagnostic for a color name which was not found: the name, the whole color value it was found in and the line
+# of the CSV data (None when unknown)
+UnknownColor = namedtuple("UnknownColor", ["name", "value", "line"])
+
+
+@functools.lru_cache(maxsize=1024)
+def color_luminance(hex_code):
+    """Returns the relative luminance of a '#RRGGBB' hex code, between 0 and 1."""
+    r, g, b = int(hex_code[1:3], 16), int(hex_code[3:5], 16), int(hex_code[5:7], 16)
+    return (0.299 * r + 0.587 * g + 0.114 * b) / 255
+
 
 def is_dark_color(hex_code):
     """Determines if a given color is dark based on its luminance.
 
     This function assumes the input is a hex color code. It converts the hex code to its RGB representation,
     calculates the luminance of the color, and determines if it is dark. The function uses a simple
-    luminance formula to assess the brightness.
+    luminance formula to assess the brightness. Luminances are memoised, as only a few colors are used.
 
     Args:
         hex_code (str): The hex code of the color to be checked.
@@ -20,70 +43,108 @@ def is_dark_color(hex_code):
         ValueError: If the input is not a valid hex code.
     """
     # Validate hex code format using regular expression
-    if not re.match(r"^#[0-9A-Fa-f]{6}$", hex_code):
+    if not HEX_CODE_PATTERN.match(hex_code):
         raise ValueError("Invalid hex code format. Expected format is '#RRGGBB'.")
 
-    # Convert hex code to RGB
-    r, g, b = int(hex_code[1:3], 16), int(hex_code[3:5], 16), int(hex_code[5:7], 16)
+    return color_luminance(hex_code) < 0.5  # Return True if color is dark
 
-    # Calculate luminance
-    luminance = (0.299 * r + 0.587 * g + 0.114 * b) / 255
-    return luminance < 0.5  # Return True if color is dark
 
-
-def process_color(color):
-    """Processes a color name to convert it to its corresponding hex codes.
+@functools.lru_cache(maxsize=4096)
+def resolve_color(color):
+    """Resolves a color value from the CSV data to a `ColorSpec`.
 
     This function handles the conversion of color names or hex codes to their respective hex codes,
-    regardless of the case of the input. It also handles 'MARBREE' (or 'MARBLES') colors by parsing and
-    returning a list of individual colors or hex codes. If a color is not found in the mapping, a default gray color
-    is used and a warning is printed.
+    regardless of the case of the input. It also handles 'MARBREE' (or 'MARBLES') colors by parsing the
+    colors in brackets. Names which are not found in the mapping are replaced by a default gray color and
+    reported in the `unknown` field of the result.
+
+    Results are memoised: a CSV file only contains a few distinct color values, however many rows it has.
 
     Args:
         color (str): The color name or hex code to be processed, which can be a regular color name, hex code,
         or 'MARBREE'/'MARBLES'.
 
     Returns:
-        list: A list of hex codes corresponding to the processed color(s).
+        ColorSpec: The resolved color.
     """
-
-    def is_hex_code(s):
-        """Check if a string is a valid hex code."""
-        if len(s) == 7 and s.startswith("#"):
-            try:
-                int(s[1:], 16)
-                return True
-            except ValueError:
-                return False
-        return False
-
     # Check if the input is already a hex code
-    if is_hex_code(color):
-        return [color]
+    if HEX_CODE_PATTERN.match(color):
+        luminance = color_luminance(color)
+        return ColorSpec((color,), "white" if luminance < 0.5 else "black", luminance, ())
 
     # Convert color name to upper case for case-insensitive comparison
     color = color.upper()
 
     # Check for 'MARBREE' or 'MARBLES' and handle accordingly
-    if "MARBREE" in color or "MARBLES" in color:
+    if MARBLED_PATTERN.search(color):
         # Extract the colors in the brackets
         colors_in_brackets = color.split("(")[-1].split(")")[0]
-        # Split the colors and map them to hex codes or validate if already hex
-        hex_codes = []
-        for c in colors_in_brackets.split("/"):
-            c = c.strip()
-            if is_hex_code(c):
-                hex_codes.append(c)
-            elif c.upper() in COLOR_MAPPING:
-                hex_codes.append(COLOR_MAPPING[c.upper()])
-            else:
-                print(f"Warning: Color '{c}' not found, defaulting to gray.")
-                hex_codes.append("#808080")
-        return hex_codes
-
-    # Single color processing
-    if color in COLOR_MAPPING:
-        return [COLOR_MAPPING[color]]
+        names = [c.strip() for c in colors_in_brackets.split("/")]
     else:
-        print(f"Warning: Color '{color}' not found, defaulting to gray.")
-        return ["#808080"]
+        names = [color]
+
+    # Map the colors to hex codes or validate if already hex
+    hex_codes = []
+    unknown = []
+    for name in names:
+        if HEX_CODE_PATTERN.match(name):
+            hex_codes.append(name)
+        elif name in COLOR_MAPPING:
+            hex_codes.append(COLOR_MAPPING[name])
+        else:
+            hex_codes.append(DEFAULT_COLOR)
+            unknown.append(name)
+
+    if len(hex_codes) > 1:
+        # Gradients always use white text
+        return ColorSpec(tuple(hex_codes), "white", None, tuple(unknown))
+
+    luminance = color_luminance(hex_codes[0])
+    return ColorSpec(tuple(hex_codes), "white" if luminance < 0.5 else "black", luminance, tuple(unknown))
+
+
+@functools.lru_cache(maxsize=4096)
+def color_spec(hex_codes):
+    """Returns the `ColorSpec` of already resolved hex codes, e.g. from the 'Couleur' value of a processed row.
+
+    Args:
+        hex_codes (tuple of str): The hex codes of the color (several for marbled routes).
+
+    Returns:
+        ColorSpec: The color, with the text color and luminance computed from the hex codes.
+
+    Raises:
+        ValueError: If a single color is not a valid hex code.
+    """
+    if len(hex_codes) > 1:
+        return ColorSpec(hex_codes, "white", None, ())
+    text_color = "white" if is_dark_color(hex_codes[0]) else "black"
+    return ColorSpec(hex_codes, text_color, color_luminance(hex_codes[0]), ())
+
+
+def process_color(color, warnings=None, line=None):
+    """Processes a color name to convert it to its corresponding hex codes.
+
+    See `resolve_color`. If a color is not found in the mapping, a default gray color is used and, when a
+    `warnings` list is given, an `UnknownColor` diagnostic is appended to it.
+
+    Args:
+        color (str): The color name or hex code to be processed, which can be a regular color name, hex code,
+        or 'MARBREE'/'MARBLES'.
+        warnings (list, optional): List to which `UnknownColor` diagnostics are appended. Defaults to None.
+        line (int, optional): Line of the CSV data the color comes from, reported in diagnostics.
+            Defaults to None.
+
+    Returns:
+        list: A list of hex codes corresponding to the processed color(s).
+    """
+    spec = resolve_color(color)
+    if warnings is not None:
+        warnings.extend(UnknownColor(name, color, line) for name in spec.unknown)
+    return list(spec.hex_codes)
+
+
+def format_color_warning(warning):
+    """Returns a human readable message for an `UnknownColor` diagnostic."""
+    location = f" on line {warning.line}" if warning.line is not None else ""
+    return f"Warning: Color '{warning.name}'{location} not found, defaulting to gray."
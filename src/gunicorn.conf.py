@@ -0,0 +1,38 @@
+"""
+Gunicorn configuration of the web application.
+
+The application is loaded and a throwaway chart is rendered in the master process, before the workers are forked,
+so that the rendering libraries, cairo and the fonts are loaded once and shared copy-on-write by the workers. The
+first request of each worker is then as fast as the following ones.
+
+The render jobs, the caches, the render slots and the metrics of the application live in the memory of a worker, so
+a single worker is run by default, and the server scales with its threads: with several workers, a job could be
+polled on a worker which does not know it, and each worker would admit its own renders.
+
+Usage:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Environment variables:
+    PORT: Port on which the server listens, default is 8080.
+    WEB_CONCURRENCY: Number of worker processes, default is 1.
+    GUNICORN_THREADS: Number of threads of each worker, default is 4.
+    GUNICORN_TIMEOUT: Timeout of a worker handling a request in seconds, default is 120.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+worker_tmp_dir = "/dev/shm"
+preload_app = True
+
+
+def on_starting(server):
+    """Warms the renderer up in the master process, after the application was preloaded."""
+    import climbing_route_chart as crc
+    from wsgi import CHART_PARAMS
+
+    server.log.info("Warming up the renderer")
+    crc.warm_up(CHART_PARAMS)
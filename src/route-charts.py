@@ -7,23 +7,54 @@ corresponds to a climbing relay, illustrating the distribution of route grades a
 charts use varying colors to differentiate between grades. The output is a PDF file suitable for printing in A4 format.
 
 Usage:
-    ./route-charts.py -i <input_file.csv> [-o <output_file.pdf>]
+    ./route-charts.py -i <input_file.csv> [-o <output_file.pdf>] [--watch]
+    ./route-charts.py --batch <input_file.csv or pattern> [...] [-d <output_dir>] [--summary <summary.json>]
+    ./route-charts.py [-i <input_file.csv>] --store <routes.sqlite> [--relays <12-30>] [--setter <name>]
+                      [--grade <grade>] [--changed]
 
 Arguments:
     -i, --input (str): Mandatory filepath to the CSV containing climbing routes data.
-    -o, --output (str): Optional destination filepath for the generated PDF file, default is 'charts.pdf'.
+    -o, --output (str): Optional destination filepath for the generated file, default is 'charts.pdf' (or 'charts.zip'
+        for the image formats).
     --title_fs (int): Optional font size for the title, default is 14.
     --grade_fs (int): Optional font size for the grade, default is 18.
     --setter_fs (int): Optional font size for the route setter, default is 8.
     --radius (float): Optional radius of the pie charts in mm, default is 69.5.
+    --engine (str): Optional engine used to generate the SVG of each relay, 'drawsvg' (default) or 'template'.
+    --format (str): Optional output format: 'pdf' (default), 'svg' or 'png' for a ZIP archive of one image per relay.
+    --dpi (int): Optional resolution of the PNG images, default is 150.
+    -w, --workers (int): Optional number of worker processes used to render the relays, default is 1.
+    --watch: Optional flag to keep running and regenerate the PDF each time the input file is saved, rendering
+        only the relays which changed.
+    --interval (float): Optional delay in seconds between two checks of the input file in watch mode, default is 1.
+    --batch (str): Optional CSV files or glob patterns to render in a single process, each to a PDF file named after
+        it. In batch mode, --workers is the number of files rendered concurrently. The exit status is 1 if any file
+        failed.
+    -d, --output-dir (str): Optional directory of the PDF files generated in batch mode, default is the current
+        directory.
+    --summary (str): Optional filepath of a JSON summary of the batch (timing, page count and error of each file).
+    --store (str): Optional filepath of an SQLite route store. The input file, if any, is imported into it (only the
+        relays which changed are updated), and the charts are rendered from it. The rendered relays are recorded
+        as printed.
+    --relays (str): Optional relays to render, as identifiers and ranges of numbers, e.g. '3,12-30'.
+    --setter (str): Optional route setter: only the relays with a route by this setter are rendered.
+    --grade (str): Optional grade: only the relays with a route of this grade are rendered.
+    --changed: Optional flag to only render the relays which changed since they were last printed. It requires
+        --store.
 
 Author:
     Hervé Le Roy
 """
 
 import argparse
-import csv
+import glob
+import json
+import logging
 import os
+import pathlib
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 
 import climbing_route_chart as crc
 
@@ -49,7 +80,7 @@ def parse_arguments():
 
     This function defines and handles the command line arguments for the script. It requires
     the input CSV file path and allows optional arguments for the output PDF file path, title font size,
-    grade font size, setter font size, and pie chart radius.
+    grade font size, setter font size, pie chart radius and number of worker processes.
 
     Returns:
         argparse.Namespace: An object containing parsed command line arguments.
@@ -72,21 +103,83 @@ def parse_arguments():
         "-o",
         "--output",
         type=str,
-        default="charts.pdf",
-        help="Destination filepath for the generated PDF file, default charts.pdf",
+        help="Destination filepath for the generated file, default charts.pdf (charts.zip for image formats)",
     )
     parser.add_argument("--title_fs", type=int, help="Font size for the title (default: 14).")
     parser.add_argument("--grade_fs", type=int, help="Font size for the grade (default: 18).")
     parser.add_argument("--setter_fs", type=int, help="Font size for the route setter (default: 8).")
     parser.add_argument("--radius", type=float, help="Radius of the pie charts in mm (default: 69.5).")
+    parser.add_argument(
+        "--engine",
+        choices=["drawsvg", "template"],
+        help="Engine used to generate the SVG of each relay (default: drawsvg). Both produce the same charts, "
+        "'template' is faster.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=crc.constants.OUTPUT_FORMATS,
+        default="pdf",
+        help="Output format: a PDF document, or a ZIP archive of one SVG or PNG image per relay (default: pdf).",
+    )
+    parser.add_argument(
+        "--dpi",
+        type=int,
+        default=crc.constants.PNG_DPI,
+        help=f"Resolution of the PNG images (default: {crc.constants.PNG_DPI}).",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes used to render the relays (default: 1).",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and regenerate the PDF when the input file changes, rendering only the changed relays.",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Delay in seconds between two checks of the input file in watch mode (default: 1).",
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="+",
+        metavar="INPUT",
+        help="CSV files or glob patterns to render in one process, each to a PDF file named after it.",
+    )
+    parser.add_argument(
+        "-d",
+        "--output-dir",
+        type=str,
+        default=".",
+        help="Directory of the PDF files generated in batch mode (default: current directory).",
+    )
+    parser.add_argument("--summary", type=str, help="Filepath of a JSON summary of the batch.")
+    parser.add_argument(
+        "--store",
+        type=str,
+        help="Filepath of an SQLite route store, updated from the input file and from which the charts are rendered.",
+    )
+    parser.add_argument("--relays", type=str, help="Relays to render, e.g. '3,12-30'.")
+    parser.add_argument("--setter", type=str, help="Only render the relays with a route by this setter.")
+    parser.add_argument("--grade", type=str, help="Only render the relays with a route of this grade.")
+    parser.add_argument(
+        "--changed",
+        action="store_true",
+        help="Only render the relays which changed since they were last printed (requires --store).",
+    )
     return parser.parse_args()
 
 
 def validate_csv_file(file_path):
-    """Validates the presence and format of the input CSV file.
+    """Validates the presence of the input CSV file.
 
-    Checks if the file exists at the given path and contains the required columns:
-    'Relais', 'Couleur', 'Cotation', and 'Ouvreur'.
+    Checks if the file exists at the given path. Its columns are checked while it is read to generate the
+    charts, so that the file is only read once.
 
     Args:
         file_path (str): The file path for the input CSV file.
@@ -94,27 +187,11 @@ def validate_csv_file(file_path):
     Returns:
         bool: True if the file is valid, False otherwise.
     """
-    required_columns = {"Relais", "Couleur", "Cotation", "Ouvreur"}
-
     # Check if the file exists
-    if not os.path.exists(file_path):
+    if not os.path.isfile(file_path):
         print(f"Error: The specified input file '{file_path}' does not exist.")
         return False
 
-    # Check if the file contains the required columns
-    try:
-        with open(file_path, mode="r", encoding="utf-8") as csvfile:
-            reader = csv.DictReader(csvfile)
-            columns = set(reader.fieldnames)
-
-            if not required_columns.issubset(columns):
-                missing_columns = required_columns - columns
-                print(f"Error: The input file is missing the following required columns: {missing_columns}")
-                return False
-    except Exception as e:
-        print(f"Error reading the CSV file: {e}")
-        return False
-
     return True
 
 
@@ -135,11 +212,355 @@ def prepare_chart_parameters(args):
         "grade_fs": args.grade_fs,
         "setter_fs": args.setter_fs,
         "radius": args.radius,
+        "engine": args.engine,
     }
     # Remove None values
     return {k: v for k, v in chart_params.items() if v is not None}
 
 
+def print_color_warnings(warnings):
+    """Prints the colors which were not found, once per color name.
+
+    Args:
+        warnings (list of climbing_route_chart.UnknownColor): Diagnostics collected while processing the CSV.
+    """
+    reported = set()
+    for warning in warnings:
+        if warning.name not in reported:
+            reported.add(warning.name)
+            print(crc.format_color_warning(warning))
+
+
+def diff_relays(previous, current):
+    """Compares two snapshots of the routes grouped by relay.
+
+    Args:
+        previous (dict): The previous mapping of relay identifier to the list of its rows.
+        current (dict): The current mapping of relay identifier to the list of its rows.
+
+    Returns:
+        tuple: The lists of added, changed and removed relay identifiers.
+    """
+    added = [relay for relay in current if relay not in previous]
+    changed = [relay for relay in current if relay in previous and current[relay] != previous[relay]]
+    removed = [relay for relay in previous if relay not in current]
+    return added, changed, removed
+
+
+def regenerate(input_path, output_path, chart_params, cache, previous, workers):
+    """Regenerates the PDF from the input file, rendering only the relays missing from the cache.
+
+    Reports which relays were added, changed or removed since the previous snapshot, and how long each
+    stage took.
+
+    Args:
+        input_path (str): The file path for the input CSV file.
+        output_path (str): The file path for the generated PDF file.
+        chart_params (dict): Parameters to customize the charts.
+        cache (climbing_route_chart.RenderCache): Cache of the pages rendered so far, resized to the number of
+            relays.
+        previous (dict): The routes grouped by relay at the previous regeneration.
+        workers (int): Number of worker processes used to render the changed relays.
+
+    Returns:
+        dict: The routes grouped by relay, to be compared with at the next regeneration.
+    """
+    start = time.perf_counter()
+    with open(input_path, "r", encoding="utf-8", newline="") as csv_file:
+        warnings = []
+        grouped_data = crc.read_routes(csv_file, warnings)
+    parsed = time.perf_counter()
+    print_color_warnings(warnings)
+
+    added, changed, removed = diff_relays(previous, grouped_data)
+    for label, relays in (("Added", added), ("Changed", changed), ("Removed", removed)):
+        if relays:
+            print(f"{label} relays: {', '.join(relays)}")
+
+    # The cache holds one page per relay: the pages of the relays are looked up first, so only the pages of the
+    # relays which changed or were removed are evicted, however many relays the gym has
+    cache.max_entries = max(len(grouped_data), 1)
+    pages, errors = crc.render_cached_pages(list(grouped_data.items()), chart_params, cache, workers)
+    for relay, error in errors:
+        print(f"Relay {relay} could not be rendered: {error}")
+    rendered = time.perf_counter()
+
+    pdf_list = [page for page in pages if page is not None]
+    size = 0
+    if pdf_list:
+        pdf_bytes = crc.merge_pdfs(pdf_list).getvalue()
+        size = len(pdf_bytes)
+        with open(output_path, "wb") as output_file:
+            output_file.write(pdf_bytes)
+    written = time.perf_counter()
+
+    print(
+        f"Regenerated {output_path} ({len(pdf_list)} pages, {format_size(size)}): parse {parsed - start:.3f}s, "
+        f"render {rendered - parsed:.3f}s, write {written - rendered:.3f}s"
+    )
+    return grouped_data
+
+
+def watch(args, chart_params):
+    """Regenerates the PDF each time the input file is modified, until interrupted.
+
+    The process stays alive between regenerations, so that the rendered pages remain in cache and only the
+    relays which changed are rendered again.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        chart_params (dict): Parameters to customize the charts.
+    """
+    cache = crc.RenderCache()
+    previous = {}
+    last_mtime = None
+
+    print(f"Watching {args.input} for changes (press Ctrl+C to stop).")
+    try:
+        while True:
+            try:
+                mtime = os.stat(args.input).st_mtime_ns
+            except FileNotFoundError:
+                # Some editors remove the file before writing it again
+                mtime = last_mtime
+
+            if mtime != last_mtime:
+                last_mtime = mtime
+                try:
+                    previous = regenerate(args.input, args.output, chart_params, cache, previous, args.workers)
+                except Exception as e:
+                    print(f"An error occurred: {e}")
+
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
+
+def parse_relay_selection(text):
+    """Parses a selection of relays, such as '3,12-30'.
+
+    Args:
+        text (str): Comma-separated relay identifiers and ranges of relay numbers.
+
+    Returns:
+        tuple: The list of relay identifiers and the list of (first, last) ranges of relay numbers.
+    """
+    relays = []
+    ranges = []
+    for item in text.replace("\u2013", "-").split(","):
+        item = item.strip()
+        first, separator, last = item.partition("-")
+        if separator and first.strip().isdigit() and last.strip().isdigit():
+            ranges.append((int(first), int(last)))
+        elif item:
+            relays.append(item)
+    return relays, ranges
+
+
+def select_routes(store, csv_data, args):
+    """Imports the CSV data (if any) into the route store, and returns the routes of the selected relays.
+
+    Args:
+        store (climbing_route_chart.RouteStore): The route store.
+        csv_data (str, os.PathLike or None): The CSV data or path of the CSV file, or None to only read the store.
+        args (argparse.Namespace): The parsed command line arguments, with the selection criteria.
+
+    Returns:
+        dict: The routes of the selected relays, grouped by relay.
+    """
+    if csv_data is not None:
+        warnings = []
+        grouped_data = crc.load_routes(csv_data, warnings)
+        print_color_warnings(warnings)
+        changed = store.import_routes(grouped_data)
+        if args.store is not None:
+            print(f"Imported {len(grouped_data)} relays into the route store, {len(changed)} added or changed.")
+
+    relays, ranges = parse_relay_selection(args.relays) if args.relays else (None, None)
+    return store.select(relays, ranges, args.setter, args.grade, unprinted=args.changed)
+
+
+def format_size(size):
+    """Returns a file size in bytes as a human readable string, e.g. '12.3 KiB'."""
+    for unit in ("bytes", "KiB", "MiB"):
+        if size < 1024 or unit == "MiB":
+            return f"{size} {unit}" if unit == "bytes" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def expand_inputs(patterns):
+    """Expands the glob patterns given in batch mode into a sorted list of files, without duplicates.
+
+    Args:
+        patterns (list of str): File paths or glob patterns.
+
+    Returns:
+        list of str: The matching files. A pattern which matches nothing is kept as is, to be reported as missing.
+    """
+    input_paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        input_paths.extend(matches or [pattern])
+    return list(dict.fromkeys(input_paths))
+
+
+def write_archive(csv_data, output_path, chart_params, output_format, dpi, warnings=None, relay_errors=None):
+    """Writes the ZIP archive of the images of the relays, adding each image as soon as it is rendered.
+
+    Args:
+        csv_data (str, os.PathLike or dict): The CSV data, path of the CSV file or routes grouped by relay.
+        output_path (str): The file path for the generated ZIP archive.
+        chart_params (dict): Parameters to customize the charts.
+        output_format (str): Format of the images, 'svg' or 'png'.
+        dpi (int): Resolution of the PNG images.
+        warnings (list, optional): List to which color diagnostics are appended. Defaults to None.
+        relay_errors (list, optional): List to which a (relay, error message) tuple is appended for each relay
+            which could not be rendered. Defaults to None.
+
+    Raises:
+        ValueError: If no relay could be rendered.
+
+    Returns:
+        int: The number of images in the archive.
+    """
+    parts = crc.iter_climbing_route_archive(csv_data, chart_params, output_format, dpi, warnings, relay_errors)
+    with open(output_path, "wb") as output_file:
+        for part in parts:
+            output_file.write(part)
+    with zipfile.ZipFile(output_path) as archive:
+        image_count = len(archive.namelist())
+    if image_count == 0:
+        raise ValueError("No relay could be rendered.")
+    return image_count
+
+
+def render_file(input_path, output_path, chart_params, output_format="pdf", dpi=crc.constants.PNG_DPI):
+    """Renders one CSV file of a batch to a PDF file, or a ZIP archive of images.
+
+    Args:
+        input_path (str): The file path for the input CSV file.
+        output_path (str): The file path for the generated file.
+        chart_params (dict): Parameters to customize the charts.
+        output_format (str, optional): 'pdf', 'svg' or 'png'. Defaults to 'pdf'.
+        dpi (int, optional): Resolution of the PNG images. Defaults to `constants.PNG_DPI`.
+
+    Returns:
+        dict: The summary of the file: its input and output paths, number of pages (or images), duration in seconds,
+        color warnings, relays which could not be rendered and error message (None if it succeeded).
+    """
+    start = time.perf_counter()
+    result = {
+        "input": input_path,
+        "output": output_path,
+        "pages": 0,
+        "bytes": 0,
+        "seconds": None,
+        "warnings": [],
+        "failed_relays": [],
+        "error": None,
+    }
+    try:
+        if not os.path.isfile(input_path):
+            raise FileNotFoundError(f"The specified input file '{input_path}' does not exist.")
+
+        # Read the routes first, so that invalid data is reported in the summary
+        warnings = []
+        grouped_data = crc.load_routes(pathlib.Path(input_path), warnings)
+        result["warnings"] = sorted({crc.format_color_warning(warning) for warning in warnings})
+
+        relay_errors = []
+        if output_format != "pdf":
+            try:
+                result["pages"] = write_archive(
+                    grouped_data, output_path, chart_params, output_format, dpi, relay_errors=relay_errors
+                )
+            finally:
+                result["failed_relays"] = [{"relay": relay, "error": error} for relay, error in relay_errors]
+            result["bytes"] = os.path.getsize(output_path)
+            result["seconds"] = round(time.perf_counter() - start, 3)
+            return result
+
+        # Errors are raised rather than printed, so that their cause is reported in the summary
+        pdf_stream = crc.generate_climbing_route_charts(
+            grouped_data, chart_params, raise_errors=True, relay_errors=relay_errors
+        )
+        result["failed_relays"] = [{"relay": relay, "error": error} for relay, error in relay_errors]
+
+        with open(output_path, "wb") as output_file:
+            output_file.write(pdf_stream.getvalue())
+        # Each relay which was rendered is one page
+        result["pages"] = len(grouped_data) - len(relay_errors)
+        result["bytes"] = len(pdf_stream.getvalue())
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(args, chart_params):
+    """Renders every CSV file of the batch in this process, or in a pool of `args.workers` processes.
+
+    Prints the outcome of each file, and writes the summary of the batch to `args.summary` if given.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+        chart_params (dict): Parameters to customize the charts.
+
+    Returns:
+        bool: True if every file was rendered, False otherwise.
+    """
+    input_paths = expand_inputs(args.batch)
+    extension = ".pdf" if args.format == "pdf" else ".zip"
+    output_paths = [os.path.join(args.output_dir, pathlib.Path(path).stem + extension) for path in input_paths]
+    if len(set(output_paths)) != len(output_paths):
+        print("Error: several input files have the same name, their PDF files would overwrite each other.")
+        return False
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    count = len(input_paths)
+    args_lists = (input_paths, output_paths, [chart_params] * count, [args.format] * count, [args.dpi] * count)
+    if args.workers > 1 and count > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, count)) as executor:
+            results = list(executor.map(render_file, *args_lists))
+    else:
+        results = list(map(render_file, *args_lists))
+    duration = time.perf_counter() - start
+
+    failures = [result for result in results if result["error"] is not None]
+    for result in results:
+        for warning in result["warnings"]:
+            print(f"{result['input']}: {warning}")
+        if result["error"] is None:
+            print(
+                f"{result['input']} -> {result['output']} ({result['pages']} pages, "
+                f"{format_size(result['bytes'])}, {result['seconds']:.3f}s)"
+            )
+        else:
+            print(f"{result['input']} failed ({result['seconds']:.3f}s): {result['error']}")
+    print(f"Rendered {len(results) - len(failures)} of {len(results)} files in {duration:.3f}s.")
+
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as summary_file:
+            json.dump({"seconds": round(duration, 3), "files": results}, summary_file, indent=2)
+
+    return not failures
+
+
+def rendered_relays(grouped_data, relay_errors):
+    """Returns the identifiers of the relays which were rendered, i.e. which are not listed in `relay_errors`.
+
+    Args:
+        grouped_data (dict): The routes which were rendered, grouped by relay.
+        relay_errors (list of tuple): (relay, error message) tuples of the relays which could not be rendered.
+
+    Returns:
+        list of str: The identifiers of the rendered relays.
+    """
+    failed = {relay for relay, _ in relay_errors}
+    return [relay for relay in grouped_data if relay not in failed]
+
+
 def main():
     """The main function of the script.
 
@@ -149,38 +570,105 @@ def main():
     """
     # Parse arguments
     args = parse_arguments()
+    # The library logs the relays which could not be rendered
+    logging.basicConfig(format="%(message)s")
+    extension = ".pdf" if args.format == "pdf" else ".zip"
+    store = None
 
     try:
+        # Batch mode renders many files in one process
+        if args.batch:
+            if not run_batch(args, prepare_chart_parameters(args)):
+                exit(1)
+            return
+
+        # Watch mode keeps running until interrupted
+        if args.watch:
+            if args.format != "pdf":
+                print("Error: watch mode only generates PDF files.")
+                exit(1)
+            if args.input is None:
+                print("Error: watch mode requires an input file.")
+                exit(1)
+            if not validate_csv_file(args.input):
+                exit(1)
+            args.output = args.output or "charts.pdf"
+            watch(args, prepare_chart_parameters(args))
+            return
+
         # Handle absence of input
-        if args.input is None:
+        if args.input is None and args.store is not None:
+            # The charts are rendered from the route store only
+            csv_data = None
+            args.output = args.output or "charts" + extension
+        elif args.input is None:
             print("No input was provided: a chart is being generated with sample data.")
             csv_data = sample_csv_data
-            args.output = args.output if args.input is not None else "sample_data_chart.pdf"
+            args.output = args.output if args.input is not None else "sample_data_chart" + extension
         else:
             # Validate csv file
             if not validate_csv_file(args.input):
                 exit(1)
 
-            # Open csv file
-            with open(args.input, "r") as csv_file:
-                csv_data = csv_file.read()
+            # The csv file is read lazily while the charts are generated
+            csv_data = pathlib.Path(args.input)
+            args.output = args.output or "charts" + extension
+
+        # Select the relays to render, through the route store
+        if args.store is not None or args.relays or args.setter is not None or args.grade is not None or args.changed:
+            if args.changed and args.store is None:
+                print("Error: --changed requires a route store (--store).")
+                exit(1)
+            store = crc.RouteStore(args.store or ":memory:")
+            csv_data = select_routes(store, csv_data, args)
+            if not csv_data:
+                print("No relay matches the selection.")
+                return
+            print(f"Rendering {len(csv_data)} of {store.relay_count()} relays.")
 
         # Prepare parameters for chart generation
         chart_params = prepare_chart_parameters(args)
 
+        relay_errors = []
+        if args.format != "pdf":
+            warnings = []
+            image_count = write_archive(
+                csv_data, args.output, chart_params, args.format, args.dpi, warnings, relay_errors
+            )
+            print_color_warnings(warnings)
+            print(
+                f"Successfully generated {image_count} {args.format.upper()} images: {args.output} "
+                f"({format_size(os.path.getsize(args.output))})"
+            )
+            if store is not None:
+                store.mark_printed(rendered_relays(csv_data, relay_errors))
+            return
+
         # Use the climbing_route_charts package to generate the PDF
-        pdf_stream = crc.generate_climbing_route_charts(csv_data, chart_params)
+        warnings = []
+        pdf_stream = crc.generate_climbing_route_charts(
+            csv_data, chart_params, workers=args.workers, warnings=warnings, relay_errors=relay_errors
+        )
+        print_color_warnings(warnings)
 
         if pdf_stream:
             # Write the PDF stream to the output file
             with open(args.output, "wb") as output_file:
                 output_file.write(pdf_stream.getvalue())
-            print(f"Successfully generated the climbing route chart: {args.output}")
+            print(
+                f"Successfully generated the climbing route chart: {args.output} "
+                f"({format_size(len(pdf_stream.getvalue()))})"
+            )
+            if store is not None:
+                store.mark_printed(rendered_relays(csv_data, relay_errors))
         else:
             print("Failed to generate the chart.")
 
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if store is not None:
+            store.close()
 
 
 if __name__ == "__main__":
@@ -1,10 +1,10 @@
-import base64
-import csv
-import io
 import logging
 import os
+import threading
+from collections import Counter
 
-from flask import Flask, make_response, render_template, request
+from flask import Flask, Response, jsonify, render_template, request, url_for
+from werkzeug.exceptions import RequestEntityTooLarge
 
 import climbing_route_chart as crc
 
@@ -12,55 +12,75 @@ logging.basicConfig(level=logging.INFO)
 
 app = Flask(__name__)
 
-DEBUG = True
+DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
 DEFAULT_PORT = "8080"
 
-
-def parse_and_validate_csv(text):
-    """
-    Parses a CSV string, validates its format and headers, and converts it to a standard CSV format if necessary.
-
-    This function checks for a specific set of required headers and validates the number of columns in each row.
-    It supports both comma-separated and tab-separated values and will convert tab-separated values to comma-separated
-    values if needed.
-
-    Args:
-        text (str): The CSV string to parse and validate.
-
-    Returns:
-        str: The original or converted CSV string in comma-separated format.
-
-    Raises:
-        ValueError: If the CSV header is missing, incorrect, or if any row does not contain the correct number of
-        values.
-    """
-    # Determine delimiter (tab or comma)
-    delimiter = "\t" if "\t" in text else ","
-
-    # Read the content using csv.reader
-    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
-
-    # Convert to list for easier processing
-    rows = list(reader)
-
-    # Check for required headers
-    required_headers = ["Relais", "Couleur", "Cotation", "Ouvreur"]
-    if rows[0] != required_headers:
-        raise ValueError("CSV header missing or incorrect on line 1")
-
-    # Validate each row
-    for index, row in enumerate(rows, start=1):  # Start counting from 1
-        if len(row) != len(required_headers) and index > 0:  # Skip the header row for this check
-            raise ValueError(f"CSV row on line {index} does not contain the correct number of values")
-
-    # If tab-delimited, convert to CSV
-    if delimiter == "\t":
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerows(rows)
-        return output.getvalue()
-
-    return text  # Return original text if already in CSV format
+# Limits on the work a single request can start
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_CONTENT_LENGTH", str(1024 * 1024)))
+MAX_ROUTES = int(os.getenv("MAX_ROUTES", "5000"))
+MAX_RELAYS = int(os.getenv("MAX_RELAYS", "500"))
+MAX_SETS = int(os.getenv("MAX_SETS", "50"))
+
+# Bounds the number of documents rendered concurrently; requests over capacity wait up to RENDER_QUEUE_TIMEOUT
+# seconds for a slot, then are rejected
+RENDER_SLOTS = threading.BoundedSemaphore(int(os.getenv("MAX_CONCURRENT_RENDERS", "2")))
+RENDER_QUEUE_TIMEOUT = float(os.getenv("RENDER_QUEUE_TIMEOUT", "5"))
+RETRY_AFTER = os.getenv("RETRY_AFTER", "10")
+
+# Counters of admitted, queued and rejected requests
+ADMISSION_STATS = Counter()
+ADMISSION_STATS_LOCK = threading.Lock()
+
+# Durations, counts and errors of the pipeline stages, and counters of the responses by status code
+STAGE_METRICS = crc.StageMetrics()
+crc.add_stage_hook(STAGE_METRICS)
+RESPONSE_STATS = Counter()
+
+# Recent full documents, keyed by their entity tag, so that repeated downloads are served without rendering. The
+# cache is bounded by its total size, as documents range from a few kilobytes to hundreds of megabytes, and a
+# streamed document is only kept in memory to be cached while it is under MAX_CACHED_DOCUMENT_BYTES
+DOCUMENT_CACHE = crc.RenderCache(
+    max_entries=int(os.getenv("DOCUMENT_CACHE_SIZE", "32")),
+    max_bytes=int(os.getenv("DOCUMENT_CACHE_BYTES", str(64 * 1024 * 1024))),
+)
+MAX_CACHED_DOCUMENT_BYTES = int(os.getenv("MAX_CACHED_DOCUMENT_BYTES", str(8 * 1024 * 1024)))
+
+# SVG previews of the relays of the form, keyed by `relay_cache_key`, so that only the relays which changed are
+# rendered again as the user types; the grid of thumbnails shows at most PREVIEW_MAX_RELAYS relays
+PREVIEW_CACHE = crc.RenderCache(
+    max_entries=int(os.getenv("PREVIEW_CACHE_SIZE", "2048")),
+    max_bytes=int(os.getenv("PREVIEW_CACHE_BYTES", str(16 * 1024 * 1024))),
+)
+PREVIEW_MAX_RELAYS = int(os.getenv("PREVIEW_MAX_RELAYS", "24"))
+
+# Documents requested in job mode are rendered in the background, so that large submissions do not hold a request.
+# Jobs hold one of the RENDER_SLOTS while they render, and their documents are shared with DOCUMENT_CACHE. They are
+# drawn on a single PDF surface like the streamed documents, rather than merged from cached pages which would each
+# embed their own fonts
+RENDER_JOBS = crc.JobQueue(
+    workers=int(os.getenv("RENDER_JOB_WORKERS", "2")),
+    max_pending=int(os.getenv("RENDER_JOB_MAX_PENDING", "16")),
+    ttl=int(os.getenv("RENDER_JOB_TTL", "600")),
+    max_finished=int(os.getenv("RENDER_JOB_MAX_FINISHED", "32")),
+    documents=DOCUMENT_CACHE,
+    slots=RENDER_SLOTS,
+)
+
+# Parameters of the charts generated from the form
+CHART_PARAMS = {"title_fs": 14, "grade_fs": 18, "setter_fs": 8, "radius": 69.5, "engine": "template"}
+
+# Largest value accepted for the numeric chart parameters of a batch request (font sizes and radius, in mm)
+MAX_CHART_PARAM = 200
+
+# Media type and file name of each output format
+OUTPUT_FILES = {
+    "pdf": ("application/pdf", "etiquettes.pdf"),
+    "svg": ("application/zip", "etiquettes-svg.zip"),
+    "png": ("application/zip", "etiquettes-png.zip"),
+    "zip": ("application/zip", "etiquettes.zip"),
+}
+MIN_DPI = 36
+MAX_DPI = 600
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -72,8 +92,24 @@ def climb_routes():
     - If the request method is POST, it processes the submitted form data to generate and return a PDF chart of
       climbing routes.
 
-    Uses the `parse_and_validate_csv` function to validate the input data and the `climbing_route_chart` library
-    to generate a PDF chart.
+    Uses the `climbing_route_chart` library to parse and validate the input data in a single pass, and to generate
+    a PDF chart from the parsed routes. The document is streamed page by page as it is rendered, all the pages being
+    drawn on a single PDF surface which embeds the fonts once. The first page is rendered before the response is
+    started, so that a submission of which no relay can be rendered is rejected with a 422.
+
+    The `format` field selects a PDF document (default) or a ZIP archive of one SVG or PNG image per relay, the PNG
+    images having the resolution of the `dpi` field. Archives are streamed as the images are rendered.
+
+    When the form is posted with `async=1`, the PDF is rendered in the background by `RENDER_JOBS` and a 202 JSON
+    response with the job id and the URLs of its status and document is returned instead.
+
+    Submissions larger than `MAX_CONTENT_LENGTH` bytes, `MAX_ROUTES` routes or `MAX_RELAYS` relays are rejected with
+    a 413. At most `RENDER_SLOTS` documents are rendered at once; a request over capacity waits for a slot and is
+    rejected with a 503 and a Retry-After header if none frees up in time.
+
+    Documents are identified by a strong ETag computed from the normalised routes and chart parameters, and recent
+    ones are served from `DOCUMENT_CACHE`. The Content-Location header of the response is the URL of the document at
+    `/documents`, where it can be downloaded again, and revalidated, with a GET request.
 
     Returns:
         str or werkzeug.wrappers.response.Response: The HTML form content as a string for GET requests
@@ -91,27 +127,425 @@ def climb_routes():
         try:
             textarea_content = request.form.get("message", "")
 
-            # Parse, validate, and possibly convert the textarea content to CSV
-            csv_string = parse_and_validate_csv(textarea_content)
+            # Parse and validate the textarea content, reporting every invalid row at once
+            warnings = []
+            grouped_data = crc.ingest_csv(textarea_content, warnings)
+            for warning in warnings:
+                logging.warning(crc.format_color_warning(warning))
+
+            route_count = sum(len(group) for group in grouped_data.values())
+            if route_count > MAX_ROUTES or len(grouped_data) > MAX_RELAYS:
+                _count("rejected_too_large")
+                return (
+                    f"Payload Too Large: at most {MAX_ROUTES} routes and {MAX_RELAYS} relays can be rendered at once",
+                    413,
+                )
+
+            output_format = request.form.get("format", "pdf")
+            dpi = request.form.get("dpi", str(crc.constants.PNG_DPI))
+            if (
+                output_format not in crc.constants.OUTPUT_FORMATS
+                or not dpi.isdigit()
+                or not MIN_DPI <= int(dpi) <= MAX_DPI
+            ):
+                return f"Bad Request: invalid format or resolution (between {MIN_DPI} and {MAX_DPI} DPI)", 400
+            dpi = int(dpi)
+
+            kind = {"pdf": "pdf", "svg": "svg", "png": f"png@{dpi}"}[output_format]
+            etag = crc.document_cache_key(grouped_data, CHART_PARAMS, kind)
+
+            if request.form.get("async") == "1" and output_format == "pdf":
+                job = RENDER_JOBS.submit(grouped_data, CHART_PARAMS, key=etag)
+                logging.info(f"Queued render job {job.id}")
+                return _job_response(job), 202
+
+            location = url_for("download_document", output_format=output_format, etag=etag)
+            document = DOCUMENT_CACHE.get(etag)
+            if document is not None:
+                logging.info("Sending cached document")
+                return _document_response(document, output_format=output_format, location=location)
+
+            if not _acquire_render_slot():
+                return "Service Unavailable: too many documents are being rendered", 503, {"Retry-After": RETRY_AFTER}
+
+            relay_errors = []
+            try:
+                if output_format == "pdf":
+                    # Generate PDF lazily using the climbing_route_chart library, streaming each page as it is drawn
+                    parts = crc.iter_climbing_route_charts(grouped_data, CHART_PARAMS, relay_errors=relay_errors)
+                else:
+                    parts = crc.iter_climbing_route_archive(
+                        grouped_data, CHART_PARAMS, output_format, dpi, relay_errors=relay_errors
+                    )
+            except Exception:
+                RENDER_SLOTS.release()
+                raise
+
+            logging.info(f"Streaming {output_format.upper()} document")
+            document = _cache_document(parts, etag, relay_errors)
+            response = _document_response(document, output_format=output_format, location=location)
+            # The document is rendered while it is streamed, so the slot is only released once it is sent
+            response.call_on_close(RENDER_SLOTS.release)
+            return response
+        except RequestEntityTooLarge:
+            _count("rejected_too_large")
+            return f"Payload Too Large: the submission exceeds {app.config['MAX_CONTENT_LENGTH']} bytes", 413
+        except crc.CSVValidationError as e:
+            return "Bad Request: " + str(e), 400, {"Content-Type": "text/plain; charset=utf-8"}
+        except crc.RenderError as e:
+            return "Unprocessable Content: " + str(e), 422
+        except crc.QueueFullError as e:
+            _count("rejected_busy")
+            return "Service Unavailable: " + str(e), 503, {"Retry-After": RETRY_AFTER}
+        except Exception as e:
+            return "Internal Server Error: " + str(e), 500
+
+
+@app.route("/batch", methods=["POST"])
+def render_batch():
+    """
+    Flask route rendering several named route sets, e.g. the sectors of a gym, in a single request.
+
+    The request body is a JSON object such as:
+
+        {"format": "zip", "sets": [{"name": "Dalle", "routes": "Relais,Couleur,Cotation,Ouvreur\n...",
+                                    "params": {"grade_fs": 16}}, ...]}
+
+    where 'routes' is CSV data as in the form, and the optional 'params' override `CHART_PARAMS` for the set.
+    The 'format' is 'pdf' (default) for a single PDF document with the pages of every set, or 'zip' for a ZIP
+    archive with one PDF document per set, each written to the response as soon as it is rendered.
 
-            # Prepare parameters for chart generation
-            chart_params = {"title_fs": 14, "grade_fs": 18, "setter_fs": 8, "radius": 69.5}
+    The sets share the render slot of the request and the state loaded by `warm_up`, and in 'zip' format the document
+    of each set is looked up in `DOCUMENT_CACHE`, where the form stores its documents too. The limits
+    on the number of routes and relays apply to the whole request, and at most `MAX_SETS` sets are accepted.
+    As for the form, recent documents are served from `DOCUMENT_CACHE`, and can be downloaded again from the URL
+    of the Content-Location header.
 
-            # Generate PDF using the climbing_route_chart library
-            pdf_stream = crc.generate_climbing_route_charts(csv_string, chart_params)
+    Returns:
+        werkzeug.wrappers.response.Response: The document, or a plain text error.
+    """
+    try:
+        payload = request.get_json(silent=True)
+        route_sets, output_format, error = _parse_batch(payload)
+        if error is not None:
+            return "Bad Request: " + error, 400, {"Content-Type": "text/plain; charset=utf-8"}
+
+        warnings = []
+        loaded_sets = [(name, crc.ingest_csv(routes, warnings), params) for name, routes, params in route_sets]
+        for warning in warnings:
+            logging.warning(crc.format_color_warning(warning))
+
+        route_count = sum(len(group) for _, grouped_data, _ in loaded_sets for group in grouped_data.values())
+        relay_count = sum(len(grouped_data) for _, grouped_data, _ in loaded_sets)
+        if route_count > MAX_ROUTES or relay_count > MAX_RELAYS:
+            _count("rejected_too_large")
+            return (
+                f"Payload Too Large: at most {MAX_ROUTES} routes and {MAX_RELAYS} relays can be rendered at once",
+                413,
+            )
+
+        etag = crc.batch_cache_key(loaded_sets, output_format)
+        location = url_for("download_document", output_format=output_format, etag=etag)
+        document = DOCUMENT_CACHE.get(etag)
+        if document is not None:
+            logging.info("Sending cached batch document")
+            return _document_response(document, output_format=output_format, location=location)
+
+        if not _acquire_render_slot():
+            return "Service Unavailable: too many documents are being rendered", 503, {"Retry-After": RETRY_AFTER}
+
+        relay_errors = []
+        try:
+            parts = crc.iter_climbing_route_batch(
+                loaded_sets, output_format, cache=DOCUMENT_CACHE, relay_errors=relay_errors
+            )
+        except Exception:
+            RENDER_SLOTS.release()
+            raise
+
+        logging.info(f"Streaming batch of {len(loaded_sets)} sets as {output_format.upper()}")
+        document = _cache_document(parts, etag, relay_errors)
+        response = _document_response(document, output_format=output_format, location=location)
+        response.call_on_close(RENDER_SLOTS.release)
+        return response
+    except RequestEntityTooLarge:
+        _count("rejected_too_large")
+        return f"Payload Too Large: the submission exceeds {app.config['MAX_CONTENT_LENGTH']} bytes", 413
+    except crc.CSVValidationError as e:
+        return "Bad Request: " + str(e), 400, {"Content-Type": "text/plain; charset=utf-8"}
+    except crc.RenderError as e:
+        return "Unprocessable Content: " + str(e), 422
+    except Exception as e:
+        return "Internal Server Error: " + str(e), 500
+
+
+def _parse_batch(payload):
+    """Validates the JSON body of a batch request.
 
-            if pdf_stream:
-                logging.info("PDF rendered")
-                pdf_base64 = base64.b64encode(pdf_stream.getvalue()).decode("utf-8")
-                response = make_response(base64.b64decode(pdf_base64))
-                response.headers.set("Content-Type", "application/pdf")
-                response.headers.set("Content-Disposition", 'attachment; filename="etiquettes.pdf"')
-                return response
+    Returns:
+        tuple: The list of (name, CSV data, chart parameters) triples, the output format and an error message,
+        which is None if the body is valid.
+    """
+    if not isinstance(payload, dict):
+        return None, None, "the body must be a JSON object"
+
+    output_format = payload.get("format", "pdf")
+    if output_format not in ("pdf", "zip"):
+        return None, None, "the format must be 'pdf' or 'zip'"
+
+    sets = payload.get("sets")
+    if not isinstance(sets, list) or not 0 < len(sets) <= MAX_SETS:
+        return None, None, f"'sets' must be a list of 1 to {MAX_SETS} route sets"
+
+    route_sets = []
+    for index, route_set in enumerate(sets, start=1):
+        if not isinstance(route_set, dict):
+            return None, None, f"set {index} must be a JSON object"
+        name = route_set.get("name", str(index))
+        routes = route_set.get("routes")
+        params = route_set.get("params") or {}
+        if not isinstance(name, str) or not isinstance(routes, str) or not isinstance(params, dict):
+            return None, None, f"set {index} must have a 'routes' string, and optionally a 'name' and 'params'"
+
+        for key, value in params.items():
+            if key == "engine":
+                valid = value in crc.constants.SVG_ENGINES
             else:
-                logging.info("An error occured")
-                raise Exception("Failed to generate the chart.")
-        except Exception as e:
-            return "Internal Server Error: " + str(e), 500
+                valid = key in CHART_PARAMS and isinstance(value, (int, float)) and not isinstance(value, bool)
+                valid = valid and 0 < value <= MAX_CHART_PARAM
+            if not valid:
+                return None, None, f"invalid chart parameter '{key}' in set {index}"
+        route_sets.append((name, routes, dict(CHART_PARAMS, **params)))
+
+    return route_sets, output_format, None
+
+
+@app.route("/preview", methods=["POST"])
+def preview():
+    """
+    Flask route returning a preview of the charts of the form, rendered as SVG without any PDF conversion.
+
+    With a `relay` field, the response is the SVG document of this relay. Otherwise, it is a JSON object with the
+    SVG documents of the first `PREVIEW_MAX_RELAYS` relays, for a grid of thumbnails, and the number of relays:
+
+        {"relays": [{"relay": "1", "svg": "<?xml ..."}, {"relay": "2", "error": "..."}, ...], "total": 12}
+
+    where a relay which could not be rendered has an error message instead of its SVG document; requested alone, it
+    is rejected with a 422.
+
+    The SVG of each relay is memoised in `PREVIEW_CACHE`. As for the form, invalid CSV data is rejected with a 400
+    listing its errors, and submissions larger than `MAX_ROUTES` routes or `MAX_RELAYS` relays with a 413.
+
+    Returns:
+        werkzeug.wrappers.response.Response: The SVG document or the JSON object, or a plain text error.
+    """
+    try:
+        grouped_data = crc.ingest_csv(request.form.get("message", ""))
+
+        route_count = sum(len(group) for group in grouped_data.values())
+        if route_count > MAX_ROUTES or len(grouped_data) > MAX_RELAYS:
+            return (
+                f"Payload Too Large: at most {MAX_ROUTES} routes and {MAX_RELAYS} relays can be rendered at once",
+                413,
+            )
+
+        relay = request.form.get("relay")
+        if relay is not None:
+            if relay not in grouped_data:
+                return "Not Found: unknown relay", 404
+            try:
+                svg = _preview_svg(relay, grouped_data[relay])
+            except Exception as e:
+                return f"Unprocessable Content: relay {relay} could not be rendered: {e}", 422
+            return Response(svg, mimetype="image/svg+xml")
+
+        previews = []
+        for relay, group in list(grouped_data.items())[:PREVIEW_MAX_RELAYS]:
+            try:
+                previews.append({"relay": relay, "svg": _preview_svg(relay, group).decode("utf-8")})
+            except Exception as e:
+                logging.warning(f"Relay {relay} could not be previewed: {e}")
+                previews.append({"relay": relay, "error": str(e)})
+        return jsonify({"relays": previews, "total": len(grouped_data)})
+    except RequestEntityTooLarge:
+        return f"Payload Too Large: the submission exceeds {app.config['MAX_CONTENT_LENGTH']} bytes", 413
+    except crc.CSVValidationError as e:
+        return "Bad Request: " + str(e), 400, {"Content-Type": "text/plain; charset=utf-8"}
+    except Exception as e:
+        return "Internal Server Error: " + str(e), 500
+
+
+def _preview_svg(relay, group):
+    """Returns the SVG document of a relay as bytes, from `PREVIEW_CACHE` or rendered and added to it."""
+    key = crc.relay_cache_key(relay, group, CHART_PARAMS, kind="svg")
+    svg = PREVIEW_CACHE.get(key)
+    if svg is None:
+        svg = crc.generate_svg_for_relay(relay, group, **CHART_PARAMS).encode("utf-8")
+        PREVIEW_CACHE.set(key, svg)
+    return svg
+
+
+def _count(name):
+    """Increments the admission counter `name`."""
+    with ADMISSION_STATS_LOCK:
+        ADMISSION_STATS[name] += 1
+
+
+def _acquire_render_slot():
+    """Waits for one of the `RENDER_SLOTS` and returns whether it was acquired, updating the admission counters."""
+    if not RENDER_SLOTS.acquire(blocking=False):
+        _count("queued")
+        logging.info("Waiting for a render slot")
+        if not RENDER_SLOTS.acquire(timeout=RENDER_QUEUE_TIMEOUT):
+            _count("rejected_busy")
+            logging.warning("Rejected a request over capacity")
+            return False
+    _count("admitted")
+    return True
+
+
+def _cache_document(document_parts, etag, relay_errors):
+    """Yields the parts of a document and stores it in `DOCUMENT_CACHE` once it has been produced entirely.
+
+    The parts are only kept while the document is at most `MAX_CACHED_DOCUMENT_BYTES` long, so that a larger document
+    is streamed without being held in memory, and is not cached. Neither is a document with missing pages, i.e. once
+    a relay was appended to `relay_errors`.
+    """
+    parts = []
+    size = 0
+    for part in document_parts:
+        size += len(part)
+        if size > MAX_CACHED_DOCUMENT_BYTES:
+            parts = None
+        elif parts is not None:
+            parts.append(part)
+        yield part
+    if parts is not None and not relay_errors:
+        DOCUMENT_CACHE.set(etag, b"".join(parts))
+
+
+def _document_response(document, etag=None, output_format="pdf", location=None):
+    """Returns a response sending a document (bytes or iterator of bytes) in `output_format` as an attachment.
+
+    With an `etag`, the response is conditional: it is a 304 if the If-None-Match header of a GET request matches.
+    """
+    mimetype, filename = OUTPUT_FILES[output_format]
+    response = Response(document, mimetype=mimetype)
+    response.headers.set("Content-Disposition", f'attachment; filename="{filename}"')
+    if location is not None:
+        response.headers.set("Content-Location", location)
+    if etag is not None:
+        response.set_etag(etag)
+        response.make_conditional(request)
+    return response
+
+
+def _job_response(job):
+    """Returns the JSON status of a render job, with the URLs to poll it and download its document."""
+    status = job.to_dict()
+    status["status_url"] = url_for("job_status", job_id=job.id)
+    status["pdf_url"] = url_for("job_pdf", job_id=job.id)
+    return jsonify(status)
+
+
+@app.route("/documents/<output_format>/<etag>", methods=["GET"])
+def download_document(output_format, etag):
+    """
+    Flask route returning a recent document from `DOCUMENT_CACHE`, identified by its format and ETag.
+
+    The response carries the ETag, and is a 304 if the If-None-Match header of the request matches it. Documents
+    which are unknown, were evicted from the cache or are in another format are a 404, and must be posted again.
+    """
+    known = output_format in OUTPUT_FILES and crc.key_kind(etag) == output_format
+    document = DOCUMENT_CACHE.get(etag) if known else None
+    if document is None:
+        return "Not Found: unknown or expired document", 404
+    return _document_response(document, etag, output_format)
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Flask route returning the status and progress (relays done out of total) of a render job, as JSON.
+    """
+    job = RENDER_JOBS.get(job_id)
+    if job is None:
+        return "Not Found: unknown or expired job", 404
+    return _job_response(job)
+
+
+@app.route("/jobs/<job_id>/pdf", methods=["GET"])
+def job_pdf(job_id):
+    """
+    Flask route returning the PDF document of a finished render job, with its ETag, or a 304 if the If-None-Match
+    header of the request matches it.
+    """
+    job = RENDER_JOBS.get(job_id)
+    if job is None:
+        return "Not Found: unknown or expired job", 404
+    if job.status == "failed":
+        return "Internal Server Error: " + job.error, 500
+    if job.status != "done":
+        return "Conflict: the document is not ready yet", 409, {"Retry-After": "1"}
+
+    return _document_response(job.result, job.key)
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    """
+    Flask route returning the admission counters and the cache statistics, as JSON.
+    """
+    with ADMISSION_STATS_LOCK:
+        admission = dict(ADMISSION_STATS)
+    return jsonify({"admission": admission, "caches": _cache_stats()})
+
+
+def _cache_stats():
+    """Returns the statistics of each cache, by name."""
+    return {"documents": DOCUMENT_CACHE.stats(), "previews": PREVIEW_CACHE.stats()}
+
+
+@app.after_request
+def count_response(response):
+    """Counts the responses by status code, for `/metrics`."""
+    with ADMISSION_STATS_LOCK:
+        RESPONSE_STATS[response.status_code] += 1
+    return response
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Flask route returning the pipeline stage metrics, admission counters, response counters and render cache
+    statistics in the Prometheus text exposition format.
+    """
+    with ADMISSION_STATS_LOCK:
+        admission = sorted(ADMISSION_STATS.items())
+        responses = sorted(RESPONSE_STATS.items())
+
+    lines = [
+        "# HELP climbing_route_chart_admission_total Number of render requests by admission outcome.",
+        "# TYPE climbing_route_chart_admission_total counter",
+    ]
+    lines += [f'climbing_route_chart_admission_total{{outcome="{name}"}} {value}' for name, value in admission]
+    lines += [
+        "# HELP climbing_route_chart_http_responses_total Number of responses by status code.",
+        "# TYPE climbing_route_chart_http_responses_total counter",
+    ]
+    lines += [f'climbing_route_chart_http_responses_total{{status="{code}"}} {value}' for code, value in responses]
+    cache_stats = _cache_stats()
+    for key, name, metric_type in (
+        ("hits", "climbing_route_chart_cache_hits_total", "counter"),
+        ("misses", "climbing_route_chart_cache_misses_total", "counter"),
+        ("entries", "climbing_route_chart_cache_entries", "gauge"),
+        ("bytes", "climbing_route_chart_cache_bytes", "gauge"),
+    ):
+        lines += [f"# HELP {name} Render cache {key}.", f"# TYPE {name} {metric_type}"]
+        lines += [f'{name}{{cache="{cache_name}"}} {stats[key]}' for cache_name, stats in cache_stats.items()]
+
+    body = STAGE_METRICS.render() + "\n".join(lines) + "\n"
+    return Response(body, mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/colors", methods=["GET"])
@@ -0,0 +1,11 @@
+import pytest
+
+
+@pytest.fixture
+def cairo():
+    """Returns the cairocffi module, skipping the test when the cairo library cannot be loaded."""
+    try:
+        import cairocffi
+    except (ImportError, OSError):
+        pytest.skip("the cairo library is not available")
+    return cairocffi
@@ -0,0 +1,41 @@
+import io
+import struct
+import zipfile
+
+import pytest
+
+from climbing_route_chart.archive import image_name, iter_zip, svg_to_png
+from climbing_route_chart.svg_generator import generate_svg_for_relay
+
+GROUP = [
+    {"Couleur": ["#0000FF"], "Cotation": "5a", "Ouvreur": "A"},
+    {"Couleur": ["#FFFF00", "#000000"], "Cotation": "6b+", "Ouvreur": "B"},
+]
+
+
+def png_size(png):
+    """Returns the (width, height) of a PNG image, read from its IHDR chunk."""
+    assert png[:8] == b"\x89PNG\r\n\x1a\n" and png[12:16] == b"IHDR"
+    return struct.unpack(">II", png[16:24])
+
+
+@pytest.mark.parametrize("dpi, size", [(72, (595, 842)), (150, (1240, 1754)), (300, (2480, 3508))])
+def test_png_size_follows_the_resolution(cairo, dpi, size):
+    svg = generate_svg_for_relay("1", GROUP, engine="template")
+
+    assert png_size(svg_to_png(svg, dpi)) == size
+
+
+def test_image_names_keep_the_page_order():
+    assert image_name(2, "12 bis/A", "png") == "002_relais_12_bis_A.png"
+
+
+def test_zip_members_are_streamed():
+    members = [("a.svg", "<svg/>", True), ("b.png", b"\x89PNG", False)]
+
+    parts = list(iter_zip(iter(members)))
+
+    assert len(parts) == 3
+    with zipfile.ZipFile(io.BytesIO(b"".join(parts))) as archive:
+        assert archive.read("a.svg") == b"<svg/>"
+        assert archive.getinfo("b.png").compress_type == zipfile.ZIP_STORED
@@ -0,0 +1,42 @@
+from climbing_route_chart.cache import RenderCache, batch_cache_key, document_cache_key, key_kind
+
+GROUPED_DATA = {"1": [{"Couleur": ["#0000FF"], "Cotation": "5a", "Ouvreur": "A"}]}
+
+
+def test_cache_is_bounded_by_size():
+    cache = RenderCache(max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"5678")
+    cache.get("a")
+
+    cache.set("c", b"90ab")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"90ab"
+    assert cache.stats()["bytes"] == 8
+
+
+def test_entry_larger_than_the_cache_is_not_kept():
+    cache = RenderCache(max_bytes=10)
+    cache.set("a", b"1234")
+
+    cache.set("b", b"x" * 11)
+
+    assert cache.get("b") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_replaced_entry_is_counted_once():
+    cache = RenderCache()
+    cache.set("a", b"1234")
+
+    cache.set("a", b"12")
+
+    assert cache.stats()["bytes"] == 2
+
+
+def test_keys_tell_the_format_of_the_document():
+    assert key_kind(document_cache_key(GROUPED_DATA)) == "pdf"
+    assert key_kind(document_cache_key(GROUPED_DATA, kind="png@150")) == "png"
+    assert key_kind(batch_cache_key([("a", GROUPED_DATA, None)], "zip")) == "zip"
+    assert key_kind("0123abcd") is None
@@ -0,0 +1,79 @@
+import shutil
+import subprocess
+
+import pytest
+
+from climbing_route_chart.font_metrics import DEFAULT_ADVANCE, FONT_FAMILY, UNITS_PER_EM, fit_label, text_width
+
+LABELS = ["5a", "6b+", "MARBREE (JAUNE / NOIRE)", "SOLVEIG", "Hervé Le Roy", "Œuvre – « Ça glisse ! »", "?"]
+
+
+@pytest.fixture
+def dejavu_context(cairo):
+    """Returns a cairo context drawing text with DejaVu Sans, without rounding the glyph advances."""
+    if shutil.which("fc-match") is None:
+        pytest.skip("fontconfig is not available")
+    family = subprocess.run(["fc-match", "-f", "%{family}", FONT_FAMILY], capture_output=True, text=True).stdout
+    if not family.startswith(FONT_FAMILY):
+        pytest.skip(f"{FONT_FAMILY} is not installed")
+
+    context = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+    options = cairo.FontOptions()
+    options.set_hint_metrics(cairo.HINT_METRICS_OFF)
+    options.set_hint_style(cairo.HINT_STYLE_NONE)
+    context.set_font_options(options)
+    context.select_font_face(FONT_FAMILY)
+    return context
+
+
+@pytest.mark.parametrize("font_size", [8, 14, 18])
+@pytest.mark.parametrize("text", LABELS)
+def test_text_width_matches_cairo(dejavu_context, text, font_size):
+    dejavu_context.set_font_size(font_size)
+
+    x_advance = dejavu_context.text_extents(text)[4]
+
+    assert text_width(text, font_size) == pytest.approx(x_advance, rel=0.01)
+
+
+def test_text_width_of_unknown_characters():
+    assert text_width("一", UNITS_PER_EM) == DEFAULT_ADVANCE
+
+
+def test_label_which_fits_is_kept():
+    assert fit_label("6b+", 18, 50, 13.5) == (("6b+",), 18)
+
+
+def test_label_is_shrunk_to_fit():
+    max_width = text_width("SOLVEIG", 8) * 0.9
+
+    lines, size = fit_label("SOLVEIG", 8, max_width, 6)
+
+    assert lines == ("SOLVEIG",)
+    assert 6 <= size < 8
+    assert text_width("SOLVEIG", size) <= max_width
+
+
+def test_label_is_wrapped_when_shrinking_is_not_enough():
+    text = "Jean-Christophe de la Fontaine"
+    max_width = text_width("Jean-Christophe", 6)
+
+    lines, size = fit_label(text, 8, max_width, 6)
+
+    assert len(lines) > 1
+    assert " ".join(lines) == text
+    assert all(text_width(line, size) <= max_width for line in lines)
+
+
+def test_single_long_word_is_shrunk_below_the_minimum_size():
+    max_width = text_width("Anticonstitutionnellement", 8) / 2
+
+    lines, size = fit_label("Anticonstitutionnellement", 8, max_width, 6)
+
+    assert lines == ("Anticonstitutionnellement",)
+    assert size < 6
+    assert text_width(lines[0], size) <= max_width
+
+
+def test_label_with_line_breaks_is_kept():
+    assert fit_label("MAT\nSOLVEIG", 8, 1, 6) == (("MAT\nSOLVEIG",), 8)
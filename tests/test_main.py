@@ -0,0 +1,64 @@
+import io
+import logging
+
+import pypdf
+import pytest
+
+from climbing_route_chart import main
+
+GROUP = [{"Couleur": ["#0000FF"], "Cotation": "5a", "Ouvreur": "A"}]
+
+
+@pytest.fixture
+def failing_relays(monkeypatch):
+    """Makes relay 'bad svg' fail to be converted to SVG, and relay 'bad page' fail to be drawn."""
+    generate_svg_for_relay = main.generate_svg_for_relay
+
+    def generate(relay, group, **params):
+        if relay == "bad svg":
+            raise RuntimeError("no SVG")
+        if relay == "bad page":
+            return "<svg"
+        return generate_svg_for_relay(relay, group, **params)
+
+    monkeypatch.setattr(main, "generate_svg_for_relay", generate)
+
+
+def test_failing_relays_are_skipped(cairo, failing_relays):
+    relay_errors = []
+
+    parts = main.iter_climbing_route_charts(
+        {"1": GROUP, "bad svg": GROUP, "bad page": GROUP, "2": GROUP}, relay_errors=relay_errors
+    )
+    document = b"".join(parts)
+
+    assert len(pypdf.PdfReader(io.BytesIO(document)).pages) == 2
+    assert [relay for relay, _ in relay_errors] == ["bad svg", "bad page"]
+
+
+def test_document_without_any_page_is_rejected(cairo, failing_relays):
+    with pytest.raises(main.RenderError):
+        main.iter_climbing_route_charts({"bad svg": GROUP, "bad page": GROUP})
+
+
+def test_archive_without_any_image_is_rejected(failing_relays):
+    with pytest.raises(main.RenderError):
+        main.iter_climbing_route_archive({"bad svg": GROUP}, output_format="svg")
+
+
+def test_render_relays_reports_the_pages_which_fail(cairo, failing_relays):
+    document, errors = main.render_relays([("1", GROUP), ("bad page", GROUP)], {})
+
+    assert document.startswith(b"%PDF")
+    assert [relay for relay, _ in errors] == ["bad page"]
+
+
+def test_failing_relays_are_logged(failing_relays, caplog):
+    relay_errors = []
+
+    b"".join(main.iter_climbing_route_archive({"1": GROUP, "bad svg": GROUP}, relay_errors=relay_errors))
+
+    assert relay_errors == [("bad svg", "no SVG")]
+    assert caplog.record_tuples == [
+        ("climbing_route_chart.main", logging.WARNING, "Relay bad svg could not be rendered: no SVG")
+    ]
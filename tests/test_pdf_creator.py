@@ -0,0 +1,122 @@
+import io
+
+import pypdf
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from climbing_route_chart.instrumentation import add_stage_hook, remove_stage_hook
+from climbing_route_chart.pdf_creator import generate_pdf_from_svgs, merge_pdfs
+from climbing_route_chart.svg_generator import generate_svg_for_relay
+
+# Stands for a font program embedded by every document, as cairo does
+FONT_DATA = b"FONT" * 4096
+
+
+def make_pdf(text):
+    """Returns a one-page PDF document showing `text`, which embeds `FONT_DATA` as its font."""
+    pdf_writer = pypdf.PdfWriter()
+    pdf_writer.add_blank_page(595, 842)
+    page = pdf_writer.pages[0]
+
+    font_file = DecodedStreamObject()
+    font_file.set_data(FONT_DATA)
+    descriptor = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/FontDescriptor"),
+            NameObject("/FontFile2"): pdf_writer._add_object(font_file),
+        }
+    )
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/TrueType"),
+            NameObject("/BaseFont"): NameObject("/Sample"),
+            NameObject("/FontDescriptor"): pdf_writer._add_object(descriptor),
+        }
+    )
+    content = DecodedStreamObject()
+    content.set_data(f"BT /F1 12 Tf 100 700 Td ({text}) Tj ET".encode("ascii"))
+    page[NameObject("/Contents")] = pdf_writer._add_object(content)
+    page[NameObject("/Resources")] = DictionaryObject(
+        {NameObject("/Font"): DictionaryObject({NameObject("/F1"): pdf_writer._add_object(font)})}
+    )
+
+    pdf_stream = io.BytesIO()
+    pdf_writer.write(pdf_stream)
+    return pdf_stream.getvalue()
+
+
+def page_texts(pdf_bytes):
+    """Returns the content stream of each page of a PDF document."""
+    return [page.get_contents().get_data() for page in pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages]
+
+
+def test_merge_keeps_pages_in_order():
+    pdf_list = [make_pdf(f"Relay {relay}") for relay in range(1, 4)]
+
+    merged = merge_pdfs(pdf_list).getvalue()
+
+    assert page_texts(merged) == [f"BT /F1 12 Tf 100 700 Td (Relay {relay}) Tj ET".encode() for relay in range(1, 4)]
+
+
+def test_merge_writes_shared_fonts_once():
+    pdf_list = [make_pdf(f"Relay {relay}") for relay in range(1, 4)]
+
+    deduplicated = merge_pdfs(pdf_list).getvalue()
+    duplicated = merge_pdfs(pdf_list, dedupe=False).getvalue()
+
+    assert len(deduplicated) < len(duplicated) - len(FONT_DATA)
+    assert page_texts(deduplicated) == page_texts(duplicated)
+    assert deduplicated.count(FONT_DATA) == 1
+
+
+def test_merge_reads_identical_documents_once():
+    pdf_bytes = make_pdf("Relay 1")
+
+    merged = merge_pdfs([pdf_bytes, make_pdf("Relay 2"), pdf_bytes]).getvalue()
+
+    pages = pypdf.PdfReader(io.BytesIO(merged)).pages
+    assert len(pages) == 3
+    assert pages[0].raw_get("/Contents").idnum == pages[2].raw_get("/Contents").idnum
+
+
+def relay_svgs(count):
+    """Returns the SVG documents of `count` relays, with different labels."""
+    return [
+        generate_svg_for_relay(str(relay), [{"Couleur": ["#0000FF"], "Cotation": f"{relay}a", "Ouvreur": f"S{relay}"}])
+        for relay in range(1, count + 1)
+    ]
+
+
+def test_single_surface_embeds_each_font_once(cairo):
+    svgs = relay_svgs(3)
+
+    one_page = generate_pdf_from_svgs(svgs[:1]).getvalue()
+    three_pages = generate_pdf_from_svgs(svgs).getvalue()
+
+    assert len(pypdf.PdfReader(io.BytesIO(three_pages)).pages) == 3
+    assert three_pages.count(b"/FontFile") == one_page.count(b"/FontFile")
+
+
+def test_merge_of_cairo_documents(cairo):
+    # Cairo embeds a subset of the fonts in each document, so the fonts of different pages are not identical
+    pdf_list = [generate_pdf_from_svgs([svg]).getvalue() for svg in relay_svgs(3)]
+
+    deduplicated = merge_pdfs(pdf_list).getvalue()
+    duplicated = merge_pdfs(pdf_list, dedupe=False).getvalue()
+
+    assert len(pypdf.PdfReader(io.BytesIO(deduplicated)).pages) == 3
+    assert len(deduplicated) <= len(duplicated)
+
+
+def test_repeated_page_is_drawn_once(cairo):
+    svg = relay_svgs(1)[0]
+    events = []
+    add_stage_hook(events.append)
+    try:
+        repeated = generate_pdf_from_svgs([svg, svg]).getvalue()
+    finally:
+        remove_stage_hook(events.append)
+
+    assert len(pypdf.PdfReader(io.BytesIO(repeated)).pages) == 2
+    assert [event.counts.get("repeated") for event in events if event.counts.get("pages")] == [None, 1]
+    assert repeated.count(b"/FontFile") == generate_pdf_from_svgs([svg]).getvalue().count(b"/FontFile")
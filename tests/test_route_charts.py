@@ -0,0 +1,22 @@
+import pathlib
+import runpy
+
+import pytest
+
+# The command line script is not a module: its functions are read from its namespace
+SCRIPT = runpy.run_path(str(pathlib.Path(__file__).parent.parent / "src" / "route-charts.py"), run_name="route_charts")
+parse_relay_selection = SCRIPT["parse_relay_selection"]
+
+
+@pytest.mark.parametrize(
+    "text, selection",
+    [
+        ("3", (["3"], [])),
+        ("3,12-30", (["3"], [(12, 30)])),
+        ("12–30", ([], [(12, 30)])),
+        (" 1 , 5 - 7 ,A,", (["1", "A"], [(5, 7)])),
+        ("B-2,12 bis", (["B-2", "12 bis"], [])),
+    ],
+)
+def test_parse_relay_selection(text, selection):
+    assert parse_relay_selection(text) == selection
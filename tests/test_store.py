@@ -0,0 +1,110 @@
+import pytest
+
+from climbing_route_chart.store import RouteStore
+
+
+def route(colors, grade, setter):
+    return {"Couleur": colors, "Cotation": grade, "Ouvreur": setter}
+
+
+GYM = {
+    "1": [route(["#0000FF"], "5a", "MAT"), route(["#FF0000"], "6a", "SOLVEIG")],
+    "2": [route(["#FFFF00", "#000000"], "6b+", "MAT")],
+    "12": [route(["#FFFFFF"], "5a", "MANU")],
+    "30": [route(["#000000"], "7a", "SOLVEIG")],
+    "A": [route(["#FF0000"], "4c", "TANGUY")],
+}
+
+
+@pytest.fixture
+def store():
+    with RouteStore() as store:
+        store.import_routes(GYM, modified=100)
+        yield store
+
+
+def selected(store, **criteria):
+    return list(store.select(**criteria))
+
+
+def test_import_returns_the_relays_which_changed(store):
+    gym = dict(GYM, **{"2": [route(["#FFFF00", "#000000"], "6c", "MAT")], "31": [route(["#0000FF"], "5b", "MAT")]})
+
+    assert store.import_routes(gym, modified=200) == ["2", "31"]
+    assert store.import_routes(gym, modified=300) == []
+
+
+def test_import_detects_reordered_routes(store):
+    gym = dict(GYM, **{"1": list(reversed(GYM["1"]))})
+
+    assert store.import_routes(gym) == ["1"]
+
+
+def test_import_removes_missing_relays():
+    with RouteStore() as store:
+        store.import_routes(GYM)
+
+        store.import_routes({"1": GYM["1"]})
+
+        assert store.relay_count() == 1
+        assert selected(store) == ["1"]
+
+
+def test_partial_import_keeps_missing_relays(store):
+    store.import_routes({"1": GYM["1"], "99": GYM["A"]}, partial=True)
+
+    assert set(selected(store)) == {"1", "2", "12", "30", "A", "99"}
+
+
+def test_routes_are_read_back(store):
+    routes = store.select(relays=["2"])["2"]
+
+    assert [(r.relay, r.grade, r.setter, list(r.color.hex_codes)) for r in routes] == [
+        ("2", "6b+", "MAT", ["#FFFF00", "#000000"])
+    ]
+
+
+@pytest.mark.parametrize(
+    "criteria, relays",
+    [
+        ({}, ["1", "2", "12", "30", "A"]),
+        ({"relays": ["A", "2"]}, ["2", "A"]),
+        ({"relays": []}, []),
+        ({"ranges": [(2, 12)]}, ["2", "12"]),
+        ({"ranges": [(1, 1), (30, 40)]}, ["1", "30"]),
+        ({"setter": "SOLVEIG"}, ["1", "30"]),
+        ({"grade": "5a"}, ["1", "12"]),
+        ({"grade": "8a"}, []),
+    ],
+)
+def test_select_by_criterion(store, criteria, relays):
+    assert selected(store, **criteria) == relays
+
+
+def test_relays_and_ranges_are_alternatives(store):
+    assert selected(store, relays=["A"], ranges=[(2, 12)]) == ["2", "12", "A"]
+
+
+def test_other_criteria_must_all_match(store):
+    assert selected(store, relays=["A"], ranges=[(1, 30)], setter="MAT") == ["1", "2"]
+    assert selected(store, ranges=[(1, 30)], setter="MAT", grade="5a") == ["1"]
+    assert selected(store, setter="MANU", grade="7a") == []
+
+
+def test_select_changed_since(store):
+    store.import_routes(dict(GYM, **{"12": [route(["#FFFFFF"], "5b", "MANU")]}), modified=200)
+
+    assert selected(store, changed_since=150) == ["12"]
+    assert selected(store, changed_since=150, setter="MAT") == []
+
+
+def test_printed_relays_are_skipped_until_they_change(store):
+    store.mark_printed(["1", "2", "12"], printed=150)
+
+    assert selected(store, unprinted=True) == ["30", "A"]
+
+    store.import_routes(dict(GYM, **{"2": [route(["#FFFF00", "#000000"], "6c", "MAT")]}), modified=200)
+    assert selected(store, unprinted=True) == ["2", "30", "A"]
+
+    store.mark_printed(["2", "30", "A"], printed=250)
+    assert selected(store, unprinted=True) == []
@@ -0,0 +1,49 @@
+import pytest
+
+from climbing_route_chart.svg_generator import generate_svg_for_relay
+
+
+def route(colors, grade, setter):
+    return {"Couleur": colors, "Cotation": grade, "Ouvreur": setter}
+
+
+RELAYS = {
+    "single route": ("1", [route(["#0000FF"], "5a", "MAT")]),
+    "single marbled route": ("2", [route(["#FFFF00", "#000000"], "5a", "MAT")]),
+    "marbled routes": (
+        "3",
+        [
+            route(["#FFFF00", "#000000"], "6b+", "SOLVEIG"),
+            route(["#FF0000"], "4c", "MANU"),
+            route(["#FFFF00", "#000000"], "7a", "TANGUY"),
+            route(["#FFFFFF", "#0000FF", "#000000"], "5c", "?"),
+        ],
+    ),
+    "escaped labels": (
+        "A&B <1>",
+        [route(["#FFFFFF"], "5a<", 'Tom & "Jerry"'), route(["#000000"], "6a", "O'Neil")],
+    ),
+    "wrapped labels": ("5", [route(["#0000FF"], "5a", "Jean-Christophe de la Fontaine")] * 8),
+}
+
+
+@pytest.mark.parametrize("relay, group", RELAYS.values(), ids=RELAYS.keys())
+def test_engines_produce_identical_svg(relay, group):
+    drawsvg_svg = generate_svg_for_relay(relay, group, engine="drawsvg")
+    template_svg = generate_svg_for_relay(relay, group, engine="template")
+
+    assert template_svg == drawsvg_svg
+
+
+def test_long_setters_are_wrapped():
+    relay, group = RELAYS["wrapped labels"]
+
+    svg = generate_svg_for_relay(relay, group, engine="template")
+
+    # The title, then a grade and at least two setter lines per route
+    assert svg.count("<text") >= 1 + 3 * len(group)
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(ValueError, match="Unknown SVG engine"):
+        generate_svg_for_relay("1", RELAYS["single route"][1], engine="cairo")